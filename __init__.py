@@ -37,7 +37,13 @@ import SCons.Tool
 import SCons.Defaults
 import SCons.Util
 import SCons.Action
+import SCons.Errors
+import collections
+import hashlib
+import json
 import os
+import re
+import sys
 
 try:
     import site_tools.cxxtestgen as cxxtestgen
@@ -53,6 +59,9 @@ except ImportError:
                                Replacements, \
                                ReplacingBuilder, \
                                ReplacingAction
+from .profile_ import ProfilingCommandAction
+from .runner_ import runTests, resultCache, changedFilter, loadTimings, testName
+from .runner_ import CANCELLED_STATUS
 
 
 CxxTestVars = [
@@ -91,33 +100,186 @@ class TestRunnerAction(object):
             setattr(self.action, name, value)
 
     def __call__(self, target, source, env, *args, **kw):
+        changed = changedFilter(env)
+        if changed is not None:
+            source = selected = changed.filter(target, source, env)
+        cache = resultCache(env)
+        if cache is not None:
+            source = cache.filter(target, source, env)
+        results = runTests(self.action, target, source, env, *args, **kw)
+        if cache is not None:
+            cache.update(source, results)
+        if changed is not None:
+            # programs with results retrieved from cache have passed too
+            ran = dict(zip(source, results))
+            changed.update(selected, [ran.get(s, 0) for s in selected])
         result = 0
-        for src in source:
-            r = self.action(target, [src], env, *args, **kw)
-            if r != 0 and result in (0, 2):
+        for r in results:
+            if r is not None and r != 0 and result in (0, 2):
                 result = r
+        if result == 0 and None in results:
+            # cancelled programs have not passed, so they must not be stamped
+            result = CANCELLED_STATUS
         return result
 
 
-class CxxTestLinkingBuilder(ReplacingBuilder):
-    def __call__(self, env, target, source, *args, **kw):
-        # preserve LIBPREFIXES and LIBSUFFIXES, so we'll still be able to
-        # link agains libraries with original $LIBPREFIX, $LIBSUFFIX etc.,
-        # even if someone sets $CXXTESTLIBPREFIX, $CXXTESTLIBSUFFIX, etc.
+#: Private flags of the tool, appended to the replaced variables (so they're
+#: kept when user sets $CXXTESTCPPFLAGS and the like).
+CxxTestAppendedFlags = {'CPPFLAGS': '_CXXTESTPCHFLAGS',
+                        'CCFLAGS': '_CXXTESTFASTLINKCCFLAGS',
+                        'LINKFLAGS': '_CXXTESTFASTLINKFLAGS'}
+
+
+def _appendFlags(subj, ovr, present=False):
+    # Appends CxxTestAppendedFlags to variables in the overrides **ovr** of
+    # **subj**. The replaced values are kept in _CXXTESTBASE* variables.
+    for name, flags in CxxTestAppendedFlags.items():
+        base = '_CXXTESTBASE%s' % name
+        value = ['$' + base, '$' + flags]
+        if name in ovr:
+            ovr[base] = ovr[name]
+        elif present or subj.get(name) == value:
+            continue
+        else:
+            ovr[base] = subj.get(name, [])
+        ovr[name] = value
+    return ovr
+
+
+class AppendingReplacements(object):
+    """Mixin for :class:`ReplacingBuilder` and :class:`ReplacingAction`,
+    which appends :data:`CxxTestAppendedFlags` to the replaced variables."""
+    def apply_replacements(self, env, **kw):
+        ovr = _appendFlags(env, self.replacements.apply(env))
+        kw = _appendFlags(kw, self.replacements.apply(kw, True), True)
+        return (env.Override(ovr), kw)
+
+
+class CxxTestReplacingAction(AppendingReplacements, ReplacingAction):
+    pass
+
+
+class CachingReplacements(object):
+    """Mixin for :class:`ReplacingBuilder`, which reuses one override
+    environment per base environment instead of creating a new one on every
+    call.
+
+    The cached environment is dropped when any of the replacement variables
+    changes its value. Keyword arguments of a call are still applied by the
+    wrapped builder on top of the shared environment. Up to
+    :attr:`maxOverrides` base environments are remembered.
+    """
+    maxOverrides = 16
+
+    def __init__(self, *args, **kw):
+        super(CachingReplacements, self).__init__(*args, **kw)
+        self.overrides = collections.OrderedDict()
+
+    def _wrapper_attributes(self):
+        return super(CachingReplacements, self)._wrapper_attributes() + \
+               ('overrides',)
+
+    def apply_replacements(self, env, **kw):
+        ovr = _appendFlags(env, self.replacements.apply(env))
+        values = repr(sorted(ovr.items()))
+        # the entry holds env, so its id can't be reused by another one
+        try:
+            subject, cached, override = self.overrides.pop(id(env))
+        except KeyError:
+            subject = None
+        if subject is not env or cached != values:
+            override = env.Override(ovr)
+        self.overrides[id(env)] = (env, values, override)
+        while len(self.overrides) > self.maxOverrides:
+            self.overrides.popitem(last=False)
+        return (override,
+                _appendFlags(kw, self.replacements.apply(kw, True), True))
+
+
+class CachingReplacingBuilder(CachingReplacements, ReplacingBuilder):
+    pass
+
+
+_varRef = re.compile(r'\$\{?([A-Za-z_]\w*)')
+_libixes = {}
+
+
+def _libixesKey(env):
+    # raw values of LIBPREFIXES, LIBSUFFIXES and the variables they refer to,
+    # these fully determine the result of substitution
+    names = ['LIBPREFIXES', 'LIBSUFFIXES']
+    values = []
+    for name in names:
+        value = env.get(name)
+        values.append(repr(value))
+        for ref in _varRef.findall(str(value)):
+            if ref not in names:
+                names.append(ref)
+    return tuple(values)
+
+
+def _substLibixes(env):
+    key = _libixesKey(env)
+    try:
+        return _libixes[key]
+    except KeyError:
         ovr = {'LIBPREFIXES': [env.subst(x) for x in env['LIBPREFIXES']],
                'LIBSUFFIXES': [env.subst(x) for x in env['LIBSUFFIXES']]}
-        return ReplacingBuilder.__call__(self, env, target, source, *args, **dict(ovr, **kw))
+        _libixes[key] = ovr
+        return ovr
 
 
-CxxTestCXXAction = ReplacingAction(SCons.Defaults.CXXAction, CxxTestReplacements)
+class CxxTestLinkingBuilder(CachingReplacingBuilder):
+    def __call__(self, env, target, source, *args, **kw):
+        # preserve LIBPREFIXES and LIBSUFFIXES, so we'll still be able to
+        # link agains libraries with original $LIBPREFIX, $LIBSUFFIX etc.,
+        # even if someone sets $CXXTESTLIBPREFIX, $CXXTESTLIBSUFFIX, etc.
+        ovr = _substLibixes(env)
+        if kw:
+            ovr = dict(ovr, **kw)
+        return CachingReplacingBuilder.__call__(self, env, target, source, *args, **ovr)
+
+
+def _writeStamp(target, source, env):
+    for t in target:
+        with open(str(t), 'w'):
+            pass
+    return 0
+
+
+def _writePchHeader(target, source, env):
+    headers = ['cxxtest/TestSuite.h'] + env.subst_list('$CXXTESTPCHHEADERS')[0]
+    with open(str(target[0]), 'w') as f:
+        for header in headers:
+            f.write('#include "%s"\n' % header)
+    return 0
+
+
+def _writeUnity(target, source, env):
+    dirname = os.path.dirname(target[0].abspath)
+    with open(str(target[0]), 'w') as f:
+        for s in source:
+            path = os.path.relpath(s.abspath, dirname)
+            f.write('#include "%s"\n' % path.replace(os.sep, '/'))
+    return 0
+
+
+compileAction = ProfilingCommandAction('CXXCOM', '$CXXCOMSTR', 'compile')
+linkAction = ProfilingCommandAction('LINKCOM', '$LINKCOMSTR', 'link')
+pchAction = ProfilingCommandAction('CXXTESTPCHCOM', '$CXXTESTPCHCOMSTR', 'compile')
+CxxTestCXXAction = CxxTestReplacingAction(compileAction, CxxTestReplacements)
+pchHeaderAction = SCons.Action.Action(_writePchHeader, None,
+                                      varlist=['CXXTESTPCHHEADERS'])
+unityAction = SCons.Action.Action(_writeUnity, None)
 runAction = TestRunnerAction(SCons.Action.Action("$CXXTESTRUNCOM", "$CXXTESTRUNCOMSTR"))
+stampAction = SCons.Action.Action(_writeStamp, None)
 
 
 def createCxxTestObjBuilder(env):
     try:
         obj = env['BUILDERS']['CxxTestStaticObject']
     except KeyError:
-        obj = SCons.Builder.Builder(action=SCons.Defaults.CXXAction,
+        obj = SCons.Builder.Builder(action=compileAction,
                                     emitter={},
                                     prefix='$OBJPREFIX',
                                     suffix='$OBJSUFFIX',
@@ -125,7 +287,7 @@ def createCxxTestObjBuilder(env):
                                     src_suffix='$CXXTESTGENSUFFIX',
                                     source_scanner=SCons.Tool.SourceFileScanner,
                                     single_source=1)
-        obj = ReplacingBuilder(obj, CxxTestReplacements)
+        obj = CachingReplacingBuilder(obj, CxxTestReplacements)
         env['BUILDERS']['CxxTestStaticObject'] = obj
         env['BUILDERS']['CxxTestObject'] = obj
     return obj
@@ -135,7 +297,7 @@ def createCxxTestProgBuilder(env):
     try:
         prog = env['BUILDERS']['CxxTestProgram']
     except KeyError:
-        prog = SCons.Builder.Builder(action=SCons.Defaults.LinkAction,
+        prog = SCons.Builder.Builder(action=linkAction,
                                      emitter='$PROGEMITTER',
                                      prefix='$PROGPREFIX',
                                      suffix='$PROGSUFFIX',
@@ -147,6 +309,33 @@ def createCxxTestProgBuilder(env):
     return prog
 
 
+def createCxxTestRunBuilder(env):
+    try:
+        run = env['BUILDERS']['CxxTestRun']
+    except KeyError:
+        action = SCons.Action.Action(runAction, None,
+                                     varlist=['CXXTESTRUNCOM',
+                                              'CXXTESTRUNFLAGS'])
+        run = SCons.Builder.Builder(action=[action, stampAction],
+                                    suffix='$CXXTESTRUNSTAMPSUFFIX',
+                                    src_suffix='$CXXTESTPROGSUFFIX',
+                                    single_source=1)
+        env['BUILDERS']['CxxTestRun'] = run
+    return run
+
+
+def createCxxTestPchBuilder(env):
+    try:
+        pch = env['BUILDERS']['CxxTestPch']
+    except KeyError:
+        pch = SCons.Builder.Builder(action=pchAction,
+                                    source_scanner=SCons.Tool.SourceFileScanner,
+                                    single_source=1)
+        pch = CachingReplacingBuilder(pch, CxxTestReplacements)
+        env['BUILDERS']['CxxTestPch'] = pch
+    return pch
+
+
 def createCxxTestBuilder(env):
     try:
         return env['BUILDERS']['CxxTest']
@@ -162,14 +351,225 @@ def _list_sources(nodes):
     return sources
 
 
+def _shardPlan(timings, count):
+    # Longest processing time first, so the shards take similar time to run.
+    loads = [0.0] * count
+    plan = {}
+    for name, duration in sorted(timings.items(), key=lambda x: (-x[1], x[0])):
+        shard = loads.index(min(loads))
+        loads[shard] += duration
+        plan[name] = shard
+    return plan
+
+
+_shardPlans = {}
+
+
+class CxxTestShard(object):
+    """Selects tests that belong to the shard **index** (counted from 1) out
+    of **count** shards.
+
+    Tests listed in **timings** are distributed such that the shards have
+    similar total run time. Other tests are assigned by a stable hash of
+    their names.
+    """
+    def __init__(self, index, count, timings=None):
+        self.index = index
+        self.count = count
+        self.plan = _shardPlan(timings, count) if timings else {}
+
+    def __call__(self, name):
+        try:
+            shard = self.plan[name]
+        except KeyError:
+            digest = hashlib.md5(name.encode('utf-8')).hexdigest()
+            shard = int(digest, 16) % self.count
+        return shard + 1 == self.index
+
+
+def _substVariable(env, kw, name):
+    # variable passed as keyword argument takes precedence over the one in env
+    return env.subst(str(kw.get(name, '$' + name)))
+
+
+def _cxxTestShard(env, kw):
+    spec = _substVariable(env, kw, 'CXXTESTSHARD')
+    if not spec:
+        return None
+    try:
+        index, count = [int(x) for x in spec.split('/')]
+    except ValueError:
+        index, count = 0, 0
+    if not (0 < index <= count):
+        raise SCons.Errors.UserError('invalid $CXXTESTSHARD: %r' % spec)
+    path = _substVariable(env, kw, 'CXXTESTTIMINGS')
+    if path:
+        path = env.File(path).abspath
+    try:
+        return _shardPlans[(index, count, path)]
+    except KeyError:
+        timings = loadTimings(path) if path else None
+        shard = CxxTestShard(index, count, timings)
+        _shardPlans[(index, count, path)] = shard
+        return shard
+
+
+def _cxxTestBatches(env, source, kw):
+    value = _substVariable(env, kw, 'CXXTESTBATCHSIZE')
+    try:
+        size = int(value or 1)
+    except ValueError:
+        raise SCons.Errors.UserError('invalid $CXXTESTBATCHSIZE: %r' % value)
+    if size <= 1:
+        return None
+    suffix = env.subst('$CXXTESTGENSRCSUFFIX')
+    batches = []
+    for i in range(0, len(source), size):
+        first = env.File(source[i])
+        name = first.name
+        if suffix and name.endswith(suffix):
+            name = name[:-len(suffix)]
+        name = os.path.join(first.dir.abspath, name + '_batch')
+        batches.append((name, source[i:i+size]))
+    return batches
+
+
+def _cxxTestUnity(env, name, parts, kw):
+    value = _substVariable(env, kw, 'CXXTESTUNITY')
+    try:
+        count = int(value or 0)
+    except ValueError:
+        raise SCons.Errors.UserError('invalid $CXXTESTUNITY: %r' % value)
+    if count <= 0 or len(parts) <= 1:
+        return parts
+    # Parts are assigned to units by a stable hash of their names, so that
+    # adding, removing or changing one suite only affects its own unit.
+    chunks = [[] for i in range(count)]
+    for part in parts:
+        digest = hashlib.md5(testName(env, part, '$CXXTESTGENSUFFIX')
+                             .encode('utf-8')).hexdigest()
+        chunks[int(digest, 16) % count].append(part)
+    suffix = _substVariable(env, kw, 'CXXTESTGENSUFFIX')
+    units = []
+    for i, chunk in enumerate(chunks):
+        if chunk:
+            unit = '%s_unity%d%s' % (name, i, suffix)
+            units += env.Command(unit, chunk, unityAction, **kw)
+    return units
+
+
+_compileVars = ['CXX', 'CXXFLAGS', 'CCFLAGS', 'CPPFLAGS', 'CPPDEFINES',
+                'CPPPATH']
+
+
+def _cxxTestSettings(env, kw, names):
+    # values of **names** as seen by the builders called with **kw**
+    env = env.Override(kw)
+    return tuple(env.subst('$' + name) for name in names)
+
+
+_pchs = {}
+_pchVars = ['CXXTESTPCHHEADERS', 'CXXTESTPCHSUFFIX', 'CXXTESTPCHCOM'] + \
+           ['CXXTEST%s' % v for v in _compileVars]
+
+
+def _cxxTestPch(env, kw):
+    path = _substVariable(env, kw, 'CXXTESTPCH')
+    if not path:
+        return ([], {})
+    key = env.File(path).abspath
+    # Compilers refuse (or ignore) headers precompiled with other options
+    settings = _cxxTestSettings(env, kw, _pchVars)
+    try:
+        used, pchs, ovr = _pchs[key]
+    except KeyError:
+        header = env.Command(key + '.h', [], pchHeaderAction, **kw)
+        suffix = _substVariable(env, kw, 'CXXTESTPCHSUFFIX')
+        pch = env.CxxTestPch(key + '.h' + suffix, header, **kw)
+        # Overrides for the builders of test objects
+        ovr = {'_CXXTESTPCHFLAGS': '$CXXTESTPCHFLAGS',
+               'CXXTESTPCHHEADER': header[0],
+               'CXXTESTPCHFILE': pch[0]}
+        pchs = list(header) + list(pch)
+        _pchs[key] = (settings, pchs, ovr)
+        return (pchs, ovr)
+    if used != settings:
+        raise SCons.Errors.UserError('%s is already used as $CXXTESTPCH '
+                                     'with different settings' % path)
+    return (pchs, ovr)
+
+
+_sharedRoots = {}
+_sharedRootVars = ['CXXTESTGENROOTCOM', '_CXXTESTPCHFLAGS'] + \
+                  ['CXXTEST%s' % v for v in _compileVars]
+
+
+def _cxxTestSharedRoot(env, kw):
+    path = _substVariable(env, kw, 'CXXTESTSHAREDROOT')
+    if not path:
+        return []
+    key = env.File(path).abspath
+    settings = _cxxTestSettings(env, kw, _sharedRootVars)
+    try:
+        used, obj = _sharedRoots[key]
+    except KeyError:
+        # Compiled once and linked into every program, so its object does
+        # not get declared again with each program's override environment
+        obj = env.CxxTestObject(env.CxxTestGenRoot(key, **kw), **kw)
+        _sharedRoots[key] = (settings, obj)
+        return obj
+    if used != settings:
+        raise SCons.Errors.UserError('%s is already used as $CXXTESTSHAREDROOT '
+                                     'with different settings' % path)
+    return obj
+
+
 def _CxxTestWrapper(env, target, source=None, root=[], **kw):
+    shard = _cxxTestShard(env, kw)
+    if shard:
+        # Tests from other shards are not even declared, so they're not built
+        if target is None:
+            source = [s for s in source if
+                      shard(testName(env, s, '$CXXTESTGENSRCSUFFIX'))]
+        elif not shard(testName(env, target[0])):
+            source = []
+        if not source:
+            if kw.get('CXXTESTALIAS', env.get('CXXTESTALIAS')):
+                return env.Alias('$CXXTESTALIAS', [], **kw)
+            return []
+
+    pchs, ovr = _cxxTestPch(env, kw)
+    kw = dict(ovr, **kw)
+
     if root:
         root = env.CxxTestGenRoot(root, **kw)
+        shared = False
+    else:
+        root = _cxxTestSharedRoot(env, kw)
+        shared = bool(root)
 
-    if target is None:
+    merged = []  # parts included by unity translation units
+    batches = _cxxTestBatches(env, source, kw) if target is None else None
+    if batches:
+        # Several suites linked into one program, a root and parts each
+        prgs = []
+        for name, parts in batches:
+            cxxs = []
+            for part in parts:
+                cxxs += env.CxxTestGenPart(part, **kw)
+            units = _cxxTestUnity(env, name, cxxs, kw)
+            if units is not cxxs:
+                merged += cxxs
+            cxxs = (root or env.CxxTestGenRoot(name, **kw)) + units
+            prgs += env.CxxTestProgram(name, cxxs, **kw)
+    elif target is None:
         prgs = []
         for src in source:
-            prgs += env.CxxTestProgram([src] + root, **kw)
+            if shared:
+                src = env.CxxTestGenPart(src, **kw)
+            else:
+                src = [src]
+            prgs += env.CxxTestProgram(src + root, **kw)
     else:
         if root:
             parts = source
@@ -179,17 +579,40 @@ def _CxxTestWrapper(env, target, source=None, root=[], **kw):
         cxxs = []
         for part in parts:
             cxxs += env.CxxTestGenPart(part, **kw)
-        prgs = env.CxxTestProgram(target, root + cxxs, **kw)
+        units = _cxxTestUnity(env, env.File(target[0]).abspath, cxxs, kw)
+        if units is not cxxs:
+            merged += cxxs
+        prgs = env.CxxTestProgram(target, root + units, **kw)
+
+    if pchs:
+        # Objects have to be rebuilt whenever the precompiled header changes
+        env.Depends(_list_sources(prgs), pchs)
+
+    fastlink = kw.get('CXXTESTFASTLINK', env.get('CXXTESTFASTLINK'))
+    if fastlink and _fastLinkSupported():
+        # Split DWARF goes to .dwo files next to the objects
+        for obj in _list_sources(prgs):
+            dwo = os.path.splitext(obj.get_abspath())[0] + '.dwo'
+            env.SideEffect(dwo, obj)
+            env.Clean(obj, dwo)
 
     if kw.get('CXXTESTALIAS', env.get('CXXTESTALIAS')):
         # Alias takes ownership over the nodes
-        alias = env.Alias('$CXXTESTALIAS', prgs, runAction, **kw)
-        env.AlwaysBuild(alias)
+        if kw.get('CXXTESTRUNSTAMP', env.get('CXXTESTRUNSTAMP')):
+            # One stamp per program, so unchanged programs are not rerun
+            runs = []
+            for prg in prgs:
+                runs += env.CxxTestRun(prg, **kw)
+            alias = env.Alias('$CXXTESTALIAS', runs, **kw)
+        else:
+            runs = []
+            alias = env.Alias('$CXXTESTALIAS', prgs, runAction, **kw)
+            env.AlwaysBuild(alias)
 
         # Do not build nodes by default
         objs = _list_sources(prgs)
         cxxs = _list_sources(objs)
-        for node in (prgs + objs + cxxs):
+        for node in (runs + prgs + objs + cxxs + merged + pchs):
             env.Ignore(node.dir, node)
             env.Clean(node.dir, node)
         return alias
@@ -216,44 +639,297 @@ def extendProgBuilder(env):
     pass
 
 
-def findCxxTestIncludePath(env):
+_includePaths = {}
+
+
+def _searchCxxTestIncludePath(script, candidates):
     def _p(p):
+        if os.path.isabs(p):
+            return p
         return os.path.join(*(p.split('/')))
 
-    script = env.subst('$CXXTESTGEN')
-    if not script or not os.path.isfile(script):
-        return []
     script = os.path.realpath(script)  # resolve symlinks
-
     scriptdir = os.path.dirname(script)
-    for reldir in [_p('..'), _p('../..'), _p('../../..')]:
-        incdir = os.path.join(scriptdir, reldir)
+    for reldir in candidates:
+        incdir = os.path.join(scriptdir, _p(reldir))
         if os.path.isfile(os.path.join(incdir, 'cxxtest', 'TestSuite.h')):
             return [os.path.normpath(incdir)]
     return []
 
 
+def _loadIncludeCache(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def _saveIncludeCache(path, data):
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    try:
+        with open(tmp, 'w') as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+            f.write('\n')
+        if os.path.exists(path) and sys.platform == 'win32':
+            os.remove(path)
+        os.rename(tmp, path)
+    except (IOError, OSError):
+        # the cache is just an optimization
+        pass
+
+
+def findCxxTestIncludePath(env):
+    script = env.subst('$CXXTESTGEN')
+    if not script:
+        return []
+    candidates = env.subst_list('$CXXTESTINCLUDESEARCH')[0]
+    candidates = [str(c) for c in candidates]
+    key = json.dumps([os.path.abspath(script)] + candidates)
+    try:
+        return list(_includePaths[key])
+    except KeyError:
+        pass
+
+    if not os.path.isfile(script):
+        return []
+    cache = env.subst('$CXXTESTINCLUDECACHE')
+    if cache:
+        cache = env.File(cache).abspath
+        data = _loadIncludeCache(cache)
+        mtime = os.path.getmtime(script)
+        entry = data.get(key)
+        if entry and entry.get('mtime') == mtime:
+            incpath = entry['path']
+        else:
+            incpath = _searchCxxTestIncludePath(script, candidates)
+            data[key] = {'mtime': mtime, 'path': incpath}
+            _saveIncludeCache(cache, data)
+    else:
+        incpath = _searchCxxTestIncludePath(script, candidates)
+    _includePaths[key] = incpath
+    return list(incpath)
+
+
+_fastLinkers = {}
+
+
+def _fastLinkSupported():
+    # -fuse-ld=... and split DWARF are for ELF targets of GCC and Clang
+    return sys.platform not in ('win32', 'cygwin', 'darwin')
+
+
+def _linkerAccepted(env, cxx, linker):
+    # e.g. GCC before 12.1 rejects -fuse-ld=mold, even if it's installed
+    command = cxx + ['-fuse-ld=%s' % linker, '-Wl,--version']
+    try:
+        with open(os.devnull, 'w') as devnull:
+            proc = SCons.Action._subproc(env, command, error='raise',
+                                         stdin=None, stdout=devnull,
+                                         stderr=devnull)
+            proc.wait()
+    except (OSError, EnvironmentError):
+        return False
+    return proc.returncode == 0
+
+
+def _cxxTestFastLinker(env):
+    """Returns linker option selecting the first of $CXXTESTFASTLINKERS
+    found in $ENV['PATH'] and accepted by $CXXTESTCXX, or an empty
+    string."""
+    if not _fastLinkSupported():
+        return ''
+    linkers = tuple(env.Split(env.subst('$CXXTESTFASTLINKERS')))
+    cxx = [str(x) for x in env.subst_list('$CXXTESTCXX')[0]]
+    key = (linkers, tuple(cxx), env['ENV'].get('PATH'))
+    try:
+        return _fastLinkers[key]
+    except KeyError:
+        pass
+    flag = ''
+    if cxx:
+        for linker in linkers:
+            if env.WhereIs('ld.%s' % linker) and \
+               _linkerAccepted(env, cxx, linker):
+                flag = '-fuse-ld=%s' % linker
+                break
+    _fastLinkers[key] = flag
+    return flag
+
+
+def _cxxTestIfFastLink(env, value):
+    if env.get('CXXTESTFASTLINK') and _fastLinkSupported():
+        return value
+    return ''
+
+
 def setCxxTestDefaults(env):
     env.SetDefault(CXXTESTOBJSUFFIX='.t$OBJSUFFIX')
+    env.SetDefault(CXXTESTLAZY=False)
+    env.SetDefault(CXXTESTINCLUDESEARCH=['..', '../..', '../../..'])
+    env.SetDefault(CXXTESTINCLUDECACHE='')
     env.SetDefault(CXXTESTINCLUDEPATH=findCxxTestIncludePath(env))
     env.SetDefault(CXXTESTCPPPATH=['$CXXTESTINCLUDEPATH', '$CPPPATH'])
+    env.SetDefault(CXXTESTFASTLINK=False)
+    env.SetDefault(CXXTESTFASTLINKERS=['mold', 'lld', 'gold'])
+    env.SetDefault(CXXTESTFASTLINKFLAGS='${_cxxTestFastLinker(__env__)}')
+    env.SetDefault(CXXTESTFASTLINKCCFLAGS=['-gsplit-dwarf'])
+    env.SetDefault(_CXXTESTFASTLINKFLAGS='${_cxxTestIfFastLink(__env__, "$CXXTESTFASTLINKFLAGS")}')
+    env.SetDefault(_CXXTESTFASTLINKCCFLAGS='${_cxxTestIfFastLink(__env__, "$CXXTESTFASTLINKCCFLAGS")}')
+    env['_cxxTestFastLinker'] = _cxxTestFastLinker
+    env['_cxxTestIfFastLink'] = _cxxTestIfFastLink
+    env.SetDefault(_CXXTESTPCHFLAGS=[])
+    env.SetDefault(CXXTESTPCH='')
+    env.SetDefault(CXXTESTPCHHEADERS=[])
+    if 'clang' in os.path.basename(env.subst('$CXX')):
+        env.SetDefault(CXXTESTPCHSUFFIX='.pch')
+        env.SetDefault(CXXTESTPCHFLAGS=['-include-pch', '$CXXTESTPCHFILE'])
+    else:
+        env.SetDefault(CXXTESTPCHSUFFIX='.gch')
+        env.SetDefault(CXXTESTPCHFLAGS=['-include', '$CXXTESTPCHHEADER',
+                                        '-Winvalid-pch'])
+    env.SetDefault(CXXTESTPCHCOM='$CXX -x c++-header -o $TARGET -c $CXXFLAGS $CCFLAGS $_CCCOMCOM $SOURCES')
+    env.SetDefault(CXXTESTPCHCOMSTR='')
     env.SetDefault(CXXTESTALIAS='check')
     env.SetDefault(CXXTESTRUNFLAGS=[])
+    env.SetDefault(CXXTESTRUNJOBS='')
+    env.SetDefault(CXXTESTRUNWEIGHT=1)
+    env.SetDefault(CXXTESTRUNMEM=0)
+    env.SetDefault(CXXTESTRUNMEMLIMIT='')
+    env.SetDefault(CXXTESTBATCHSIZE=1)
+    env.SetDefault(CXXTESTSHAREDROOT='')
+    env.SetDefault(CXXTESTUNITY=0)
+    env.SetDefault(CXXTESTRUNSTAMP=False)
+    env.SetDefault(CXXTESTRUNSTAMPSUFFIX='.passed')
+    env.SetDefault(CXXTESTRESULTCACHE='')
+    env.SetDefault(CXXTESTRESULTCACHEENV=[])
+    env.SetDefault(CXXTESTRESULTCACHESIZE=1024*1024)
+    env.SetDefault(CXXTESTCHANGED='')
+    env.SetDefault(CXXTESTFAILFAST=False)
+    env.SetDefault(CXXTESTSTREAM=False)
+    env.SetDefault(CXXTESTCAPTUREMAX=1024*1024)
+    env.SetDefault(CXXTESTSPLITSUITES=False)
+    env.SetDefault(CXXTESTPROGRESS=False)
+    env.SetDefault(CXXTESTSHARD='')
+    env.SetDefault(CXXTESTTIMINGS='')
+    env.SetDefault(CXXTESTREPORT='')
+    env.SetDefault(CXXTESTREPORTSLOWEST=0)
+    env.SetDefault(CXXTESTPROFILE='')
+    env.SetDefault(CXXTESTTIMEOUT=0)
     env.SetDefault(CXXTESTRUNCOM='$SOURCE.abspath $CXXTESTRUNFLAGS')
     env.SetDefault(CXXTESTRUNCOMSTR='$CXXTESTRUNCOM')
     CxxTestReplacements.inject(env, 'SetDefault')
 
 
-def generate(env):
+_optionsAdded = False
+
+
+def addCxxTestOptions():
+    global _optionsAdded
+    if _optionsAdded:
+        return
+    _optionsAdded = True
+    try:
+        from SCons.Script import AddOption
+        AddOption('--cxxtest-report-slowest', dest='cxxtest_report_slowest',
+                  type='int', metavar='N',
+                  help='Report N slowest test programs at exit.')
+        AddOption('--cxxtest-fail-fast', dest='cxxtest_fail_fast',
+                  action='store_true', default=False,
+                  help='Stop running test programs after the first failure.')
+        AddOption('--cxxtest-stream', dest='cxxtest_stream',
+                  action='store_true', default=False,
+                  help='Write output of test programs line by line, as it '
+                       'comes, prefixed with program names.')
+        AddOption('--cxxtest-progress', dest='cxxtest_progress',
+                  action='store_true', default=False,
+                  help='Show progress of test programs on the terminal.')
+    except Exception:
+        # not running under SCons command-line interface, or the option is
+        # already added by another copy of this tool
+        pass
+
+
+def profileGenBuilders(env):
+    # Let $CXXTESTPROFILE cover the builders of the cxxtestgen tool as well
+    for name in ('CxxTestGen', '_CxxTestGenRoot', 'CxxTestGenPart'):
+        try:
+            builder = env['BUILDERS'][name]
+        except KeyError:
+            continue
+        action = builder.action
+        if type(action) is SCons.Action.LazyAction:
+            builder.action = ProfilingCommandAction(action.var,
+                                                    action.gen_kw.get('cmdstr'),
+                                                    'generate')
+
+
+def _generate(env):
     cxxtestgen.generate(env)
+    profileGenBuilders(env)
     extendObjBuilders(env)
     extendProgBuilder(env)
     createCxxTestObjBuilder(env)
     createCxxTestProgBuilder(env)
+    createCxxTestRunBuilder(env)
+    createCxxTestPchBuilder(env)
     createCxxTestBuilder(env)
     setCxxTestDefaults(env)
 
 
+_lazyBuilders = ('CxxTestGen',
+                 '_CxxTestGenRoot',
+                 'CxxTestGenPart',
+                 'CxxTestStaticObject',
+                 'CxxTestObject',
+                 'CxxTestProgram',
+                 'CxxTestRun',
+                 'CxxTestPch',
+                 'CxxTest')
+
+
+class LazyBuilder(object):
+    """Placeholder for the builder **name**, registered in lazy mode.
+
+    When called, sets the tool up in the calling environment and forwards
+    the call to the actual builder.
+    """
+    def __init__(self, name):
+        self.name = name
+
+    def __call__(self, env, *args, **kw):
+        generateLazily(env)
+        return getattr(env, self.name)(*args, **kw)
+
+
+def _CxxTestGenRootWrapper(env, target, **kw):
+    return env._CxxTestGenRoot(target, [], **kw)
+
+
+def generateLazily(env):
+    """Sets the tool up in **env**, if it was loaded in lazy mode and no
+    builder has been used so far."""
+    builders = env['BUILDERS']
+    for name in _lazyBuilders:
+        if isinstance(builders.get(name), LazyBuilder):
+            del builders[name]
+    _generate(env)
+
+
+def generate(env):
+    if env.get('CXXTESTLAZY'):
+        # Defer the setup until one of the builders is used
+        for name in _lazyBuilders:
+            env['BUILDERS'].setdefault(name, LazyBuilder(name))
+        try:
+            env.CxxTestGenRoot
+        except AttributeError:
+            env.AddMethod(_CxxTestGenRootWrapper, 'CxxTestGenRoot')
+    else:
+        _generate(env)
+    addCxxTestOptions()
+
+
 def exists(env):
     return cxxtestgen.exists(env)
 
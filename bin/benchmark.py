@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#
+# Copyright (c) 2014-2020 by Paweł Tomulik
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE
+
+# Measure the cost of the cxxtest tool on synthetic source trees
+
+import argparse
+import glob
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+def suites_count(s):
+    try:
+        n = int(s)
+    except ValueError:
+        n = 0
+    if n <= 0:
+        raise argparse.ArgumentTypeError('wrong number of suites %r' % s)
+    return n
+
+def info(msg, **kw):
+    try: quiet = kw['quiet']
+    except KeyError: quiet = False
+    if not quiet:
+        sys.stdout.write("%s: info: %s\n" % (_script, msg))
+
+def warn(msg, **kw):
+    try: quiet = kw['quiet']
+    except KeyError: quiet = False
+    if not quiet:
+        sys.stderr.write("%s: warning: %s\n" % (_script, msg))
+
+_suite_template = """\
+// %(name)s.t.h
+#include <cxxtest/TestSuite.h>
+class %(name)s : public CxxTest::TestSuite
+{
+public:
+void testAddition(void)
+{
+  TS_ASSERT_EQUALS(%(i)d + 1, %(j)d);
+}
+};
+"""
+
+# Timings of the SConscript phase are measured by SConstruct itself and
+# written to the file given by BENCHMARK_OUT argument
+_sconstruct_template = """\
+import json
+import time
+import sconstool.loader
+sconstool.loader.extend_toolpath(transparent=True)
+t0 = time.time()
+env = Environment(tools=['default'], %(variables)s)
+t1 = time.time()
+env.Tool('cxxtest')
+t2 = time.time()
+%(declare)s
+t3 = time.time()
+with open(ARGUMENTS['BENCHMARK_OUT'], 'w') as f:
+    json.dump({'environment': t1 - t0, 'load': t2 - t1, 'declare': t3 - t2}, f)
+"""
+
+_sconscript_template = """\
+Import(['env'])
+%(declare)s
+"""
+
+# How many suites are linked into one program in the 'multi' layout
+_parts_per_program = 10
+
+def suite_names(count):
+    return ['MyTestSuite%d' % i for i in range(count)]
+
+def write_file(path, content):
+    dirname = os.path.dirname(path)
+    if dirname and not os.path.isdir(dirname):
+        os.makedirs(dirname)
+    with open(path, 'w') as f:
+        f.write(content)
+
+def write_suites(srcdir, names):
+    for i, name in enumerate(names):
+        path = os.path.join(srcdir, '%s.t.h' % name)
+        write_file(path, _suite_template % {'name': name, 'i': i, 'j': i + 1})
+
+def install_tool(topdir):
+    tooldir = os.path.join(topdir, 'site_scons', 'site_tools', 'cxxtest')
+    os.makedirs(tooldir)
+    for source in glob.glob(os.path.join(_topsrcdir, '*.py')):
+        if os.path.basename(source) != 'setup.py':
+            shutil.copy(source, tooldir)
+
+def generate_tree(topdir, layout, count, **kw):
+    """Generate source tree with **count** suites for the given **layout**"""
+    names = suite_names(count)
+    variables = ['CXXTESTRUNSTAMP=True']
+    if kw.get('cxxtestgen'):
+        variables.append('CXXTESTGEN=%r' % os.path.abspath(kw['cxxtestgen']))
+    if layout == 'noalias':
+        variables.append('CXXTESTALIAS=None')
+
+    headers = ', '.join('%r' % ('%s.t.h' % n) for n in names)
+    if layout in ('single', 'noalias'):
+        declare = "env.CxxTest([%s])" % headers
+        if layout == 'noalias':
+            declare = "env.Alias('check', %s)" % declare
+    elif layout == 'multi':
+        lines = []
+        for i in range(0, count, _parts_per_program):
+            chunk = names[i:i+_parts_per_program]
+            lines.append("env.CxxTest('Program%d', [%s])" % (
+                i // _parts_per_program,
+                ', '.join('%r' % ('%s.t.h' % n) for n in chunk)))
+        declare = '\n'.join(lines)
+    elif layout == 'variant_dir':
+        declare = "env.CxxTest([%s])" % headers
+        write_file(os.path.join(topdir, 'src', 'SConscript'),
+                   _sconscript_template % {'declare': declare})
+        declare = "SConscript('src/SConscript', variant_dir='build', " \
+                  "duplicate=0, exports=['env'])"
+    else:
+        raise ValueError('unsupported layout: %r' % layout)
+
+    srcdir = os.path.join(topdir, 'src') if layout == 'variant_dir' else topdir
+    write_suites(srcdir, names)
+    install_tool(topdir)
+    write_file(os.path.join(topdir, 'SConstruct'), _sconstruct_template % {
+        'variables': ', '.join(variables), 'declare': declare})
+
+def run_scons(topdir, args, **kw):
+    """Run scons in **topdir**, return wall time and SConscript timings"""
+    fd, out = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+    command = kw['scons'].split() + ['-Q', 'BENCHMARK_OUT=%s' % out] + args
+    try:
+        t0 = time.time()
+        with open(os.devnull, 'w') as devnull:
+            status = subprocess.call(command, cwd=topdir, stdout=devnull)
+        wall = time.time() - t0
+        if status != 0:
+            raise RuntimeError('%r failed with status %d' % (command, status))
+        with open(out) as f:
+            timings = json.load(f)
+    finally:
+        os.remove(out)
+    timings['wall'] = wall
+    return timings
+
+def benchmark(topdir, layout, count, **kw):
+    """Time the phases of a build of **count** suites in **layout**"""
+    generate_tree(topdir, layout, count, **kw)
+    result = {'layout': layout, 'suites': count}
+    # SConscript phase only, nothing gets built
+    result['sconscript'] = run_scons(topdir, ['-n', 'SConstruct'], **kw)
+    if 'full' in kw['phases']:
+        result['full'] = run_scons(topdir, ['-j%d' % kw['jobs'], 'check'], **kw)
+        if 'null' in kw['phases']:
+            result['null'] = run_scons(topdir, ['check'], **kw)
+    return result
+
+def environment_info(**kw):
+    about = {}
+    with open(os.path.join(_topsrcdir, 'about.py')) as f:
+        exec(f.read(), about)
+    try:
+        scons = subprocess.check_output(kw['scons'].split() + ['--version'])
+        scons = scons.decode('utf-8', 'replace').strip().splitlines()[-2:]
+    except (OSError, subprocess.CalledProcessError):
+        scons = None
+    return {'cxxtest': about['__version__'],
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'scons': scons,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+# The script...
+_script = os.path.basename(sys.argv[0])
+_scriptabs = os.path.realpath(sys.argv[0])
+_scriptdir = os.path.dirname(_scriptabs)
+_topsrcdir = os.path.realpath(os.path.join(_scriptdir, '..'))
+
+_all_layouts = ['single', 'multi', 'noalias', 'variant_dir']
+_all_phases = ['sconscript', 'full', 'null']
+
+_parser = argparse.ArgumentParser(
+        prog=_script,
+        description="""\
+        This tool generates source trees with the given numbers of test
+        suites and measures how long SCons takes to load the cxxtest tool
+        and declare the tests (SConscript phase), to build and run all the
+        tests (full build) and to find out there is nothing to do (null
+        build). Results are written in JSON format, such that they may be
+        compared between releases.
+        """)
+
+_parser.add_argument('--quiet',
+                      action='store_true',
+                      help='do not print messages')
+_parser.add_argument('--suites',
+                      type=suites_count,
+                      nargs='+',
+                      default=[10, 100, 1000],
+                      metavar='N',
+                      help='numbers of test suites in generated trees')
+_parser.add_argument('--layouts',
+                      choices=_all_layouts,
+                      nargs='+',
+                      default=_all_layouts,
+                      metavar='LAYOUT',
+                      help='layouts of generated trees (%s)' % ', '.join(_all_layouts))
+_parser.add_argument('--phases',
+                      choices=_all_phases,
+                      nargs='+',
+                      default=['sconscript'],
+                      metavar='PHASE',
+                      help='phases to be measured (%s), full and null builds '
+                           'require CxxTest and a C++ compiler' % ', '.join(_all_phases))
+_parser.add_argument('--jobs', '-j',
+                      type=int,
+                      default=1,
+                      metavar='N',
+                      help='number of parallel jobs in full builds')
+_parser.add_argument('--scons',
+                      default='scons',
+                      metavar='CMD',
+                      help='command used to run SCons')
+_parser.add_argument('--cxxtestgen',
+                      default=None,
+                      metavar='PATH',
+                      help='path to cxxtestgen script')
+_parser.add_argument('--workdir',
+                      default=None,
+                      metavar='DIR',
+                      help='where to generate trees (default: temporary directory)')
+_parser.add_argument('--keep',
+                      action='store_true',
+                      help='do not remove generated trees')
+_parser.add_argument('--output', '-o',
+                      default='benchmark.json',
+                      metavar='FILE',
+                      help='file to write results to')
+
+_args = _parser.parse_args()
+
+def main():
+    kw = vars(_args)
+    if kw['cxxtestgen'] is None:
+        cxxtestgen = os.path.join(_topsrcdir, 'cxxtest', 'bin', 'cxxtestgen')
+        if os.path.isfile(cxxtestgen):
+            kw['cxxtestgen'] = cxxtestgen
+    workdir = kw['workdir'] or tempfile.mkdtemp(prefix='cxxtest-benchmark-')
+    results = []
+    try:
+        for layout in kw['layouts']:
+            for count in kw['suites']:
+                topdir = os.path.join(workdir, '%s-%d' % (layout, count))
+                if os.path.exists(topdir):
+                    shutil.rmtree(topdir)
+                info("%s layout, %d suites" % (layout, count), **kw)
+                try:
+                    results.append(benchmark(topdir, layout, count, **kw))
+                except RuntimeError as e:
+                    warn(str(e), **kw)
+                    return 1
+                finally:
+                    if not kw['keep']:
+                        shutil.rmtree(topdir, ignore_errors=True)
+    finally:
+        if not kw['keep'] and not kw['workdir']:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(kw['output'], 'w') as f:
+        json.dump({'environment': environment_info(**kw), 'results': results},
+                  f, indent=1, sort_keys=True)
+        f.write('\n')
+    info("results written to '%s'" % kw['output'], **kw)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+# Local Variables:
+# # tab-width:4
+# # indent-tabs-mode:nil
+# # End:
+# vim: set syntax=python expandtab tabstop=4 shiftwidth=4:
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""sconstool.cxxtest.process_
+
+Helpers for running test programs and other commands as child processes.
+
+There normally shouldn't be any need to import this module directly.
+"""
+
+#
+# Copyright (c) 2018-2020 by Paweł Tomulik
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import errno
+import os
+import sys
+
+
+__all__ = ('newSession', 'waitProcess')
+
+
+def newSession():
+    """Returns keyword arguments for ``subprocess.Popen()``, which start the
+    process in a new session (and process group)."""
+    if sys.version_info >= (3, 2):
+        # preexec_fn is not safe in presence of threads
+        return {'start_new_session': True}
+    return {'preexec_fn': os.setsid}
+
+
+def _exitStatus(status):
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def waitProcess(proc):
+    """Waits for **proc** to terminate and returns its resource usage, or
+    ``None`` if not available on this platform."""
+    if not hasattr(os, 'wait4'):
+        proc.wait()
+        return None
+    while True:
+        try:
+            _, status, usage = os.wait4(proc.pid, 0)
+        except OSError as e:
+            if e.errno == errno.EINTR:
+                continue
+            # already reaped, e.g. by proc.poll() in another thread
+            proc.wait()
+            return None
+        proc.returncode = _exitStatus(status)
+        return usage
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""sconstool.cxxtest.profile_
+
+Records wall and CPU time and peak memory usage of the commands run by the
+tool (test generation, compilation, linking and test runs) in a Chrome
+trace-event file, which can be loaded into ``chrome://tracing`` or Perfetto.
+
+There normally shouldn't be any need to import this module directly.
+"""
+
+#
+# Copyright (c) 2018-2020 by Paweł Tomulik
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+from .process_ import waitProcess
+import SCons.Action
+import atexit
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+
+__all__ = ('Profiler',
+           'ProfilingCommandAction',
+           'profiler',
+           'shellCommand',
+           'usageInfo')
+
+
+def shellCommand(sh, escape, args):
+    """Returns the command that runs **args** through the shell **sh**."""
+    # Same as SCons does in its platform-specific spawn() functions.
+    if sys.platform == 'win32':
+        return ' '.join([sh, '/C', escape(' '.join(args))])
+    return [sh, '-c', ' '.join(args)]
+
+
+def usageInfo(usage):
+    """Returns CPU time (seconds) and peak resident set size (KiB) from the
+    resource **usage** as a dictionary."""
+    if usage is None:
+        return {}
+    maxrss = usage.ru_maxrss
+    if sys.platform == 'darwin':
+        maxrss = maxrss // 1024  # reported in bytes
+    return {'cpu': usage.ru_utime + usage.ru_stime, 'maxrss': maxrss}
+
+
+class Profiler(object):
+    """Collects trace events and writes them to a file at **path**."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.epoch = time.time()
+        self.threads = {}
+        self.events = []
+
+    def record(self, name, category, start, duration, **args):
+        """Records that **name** of **category** ran for **duration**
+        seconds from **start**."""
+        with self.lock:
+            ident = threading.current_thread().ident
+            tid = self.threads.setdefault(ident, len(self.threads) + 1)
+            self.events.append({'name': name,
+                                'cat': category,
+                                'ph': 'X',
+                                'pid': os.getpid(),
+                                'tid': tid,
+                                'ts': int((start - self.epoch) * 1e6),
+                                'dur': int(duration * 1e6),
+                                'args': args})
+
+    def save(self):
+        with self.lock:
+            events = list(self.events)
+        if not events:
+            return
+        for tid in sorted(set(e['tid'] for e in events)):
+            events.append({'name': 'thread_name', 'ph': 'M',
+                           'pid': os.getpid(), 'tid': tid,
+                           'args': {'name': 'job %d' % tid}})
+        dirname = os.path.dirname(self.path)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        with open(self.path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+            f.write('\n')
+
+
+_profilers = {}
+_profilers_lock = threading.Lock()
+
+
+def profiler(env):
+    """Returns the :class:`Profiler` for ``$CXXTESTPROFILE``, or ``None``
+    if profiling is disabled."""
+    path = env.subst('$CXXTESTPROFILE')
+    if not path or not SCons.Action.execute_actions:
+        return None
+    path = env.File(path).abspath
+    with _profilers_lock:
+        try:
+            return _profilers[path]
+        except KeyError:
+            prof = _profilers[path] = Profiler(path)
+            atexit.register(prof.save)
+            return prof
+
+
+def _platformSpawn(spawn):
+    # True for the spawn() of SCons's platform module, which just runs the
+    # command through the shell
+    return getattr(spawn, '__module__', '').startswith('SCons.Platform.')
+
+
+class _ProfilingSpawn(object):
+    # Wraps $SPAWN. Commands run by SCons's own spawn() are run the same way
+    # here, so their resource usage can be collected. Custom $SPAWN is called
+    # as is, only wall time of its commands is recorded then.
+    def __init__(self, spawn):
+        self.spawn = spawn
+        self.usage = {}
+
+    def __call__(self, sh, escape, cmd, args, env):
+        if not hasattr(os, 'wait4') or not _platformSpawn(self.spawn):
+            return self.spawn(sh, escape, cmd, args, env)
+        try:
+            proc = subprocess.Popen(shellCommand(sh, escape, args), env=env,
+                                    close_fds=True)
+        except OSError as e:
+            sys.stderr.write('scons: %s: %s\n' % (cmd, e.strerror))
+            return 127
+        usage = usageInfo(waitProcess(proc))
+        self.usage['cpu'] = self.usage.get('cpu', 0.0) + usage['cpu']
+        self.usage['maxrss'] = max(self.usage.get('maxrss', 0), usage['maxrss'])
+        return proc.returncode
+
+
+class ProfilingCommandAction(SCons.Action.LazyAction):
+    """Same as ``SCons.Action.Action('$' + var, cmdstr)``, but records its
+    executions of **category** when ``$CXXTESTPROFILE`` is set."""
+    def __init__(self, var, cmdstr, category):
+        SCons.Action.LazyAction.__init__(self, var, {'cmdstr': cmdstr})
+        self.category = category
+
+    def execute(self, target, source, env, executor=None):
+        prof = profiler(env)
+        if prof is None:
+            return SCons.Action.CommandAction.execute(self, target, source,
+                                                      env, executor)
+        spawn = _ProfilingSpawn(env['SPAWN'])
+        start = time.time()
+        result = None
+        try:
+            result = SCons.Action.CommandAction.execute(
+                self, target, source, env.Override({'SPAWN': spawn}), executor)
+            return result
+        finally:
+            prof.record(str(target[0]), self.category, start,
+                        time.time() - start, target=str(target[0]),
+                        status=getattr(result, 'status', result) or 0,
+                        **spawn.usage)
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
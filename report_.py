@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""sconstool.cxxtest.report_
+
+Writes machine-readable reports with outcomes of test programs.
+
+There normally shouldn't be any need to import this module directly.
+"""
+
+#
+# Copyright (c) 2018-2020 by Paweł Tomulik
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import json
+import os
+import re
+import xml.etree.ElementTree as ET
+
+
+__all__ = ('writeReports', 'writeJUnitXML', 'writeJSON')
+
+
+_invalid_xml_chars = re.compile(u'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _xml_text(text):
+    return _invalid_xml_chars.sub(u'', text)
+
+
+def _summary(results):
+    summary = {'tests': len(results), 'failures': 0, 'errors': 0,
+               'skipped': 0, 'time': 0.0}
+    for result in results:
+        outcome = result['outcome']
+        if outcome == 'failed':
+            summary['failures'] += 1
+        elif outcome == 'timeout':
+            summary['errors'] += 1
+        elif outcome in ('cached', 'cancelled'):
+            summary['skipped'] += 1
+        summary['time'] += result['duration']
+    return summary
+
+
+def _xunit_testcases(output):
+    # Output of a runner generated with "cxxtestgen --runner=XmlPrinter"
+    # already is a JUnit XML document, reuse its test cases.
+    start = output.find('<testsuite')
+    end = output.rfind('</testsuite>')
+    if start < 0 or end < 0:
+        return None
+    try:
+        suite = ET.fromstring(output[start:end + len('</testsuite>')])
+    except ET.ParseError:
+        return None
+    return suite.findall('testcase')
+
+
+def _testsuite(result):
+    suite = ET.Element('testsuite', name=result['name'])
+    testcases = _xunit_testcases(result['output'])
+    if testcases:
+        suite.extend(testcases)
+    if not testcases or result['outcome'] in ('timeout', 'cached',
+                                              'cancelled'):
+        name = result['name'].rpartition('/')[2]
+        testcase = ET.SubElement(suite, 'testcase',
+                                 classname=result['name'].replace('/', '.'),
+                                 name=name,
+                                 time='%.3f' % result['duration'])
+        message = 'exit status %s' % result['status']
+        if result['outcome'] == 'failed':
+            ET.SubElement(testcase, 'failure', message=message)
+        elif result['outcome'] == 'timeout':
+            ET.SubElement(testcase, 'error', type='timeout',
+                          message='timed out')
+        elif result['outcome'] == 'cached':
+            ET.SubElement(testcase, 'skipped', message='cached result')
+        elif result['outcome'] == 'cancelled':
+            ET.SubElement(testcase, 'skipped',
+                          message='cancelled after a failure')
+    testcases = suite.findall('testcase')
+    suite.set('tests', str(len(testcases)))
+    for key, tag in (('failures', 'failure'), ('errors', 'error'),
+                     ('skipped', 'skipped')):
+        count = len([tc for tc in testcases if tc.find(tag) is not None])
+        suite.set(key, str(count))
+    suite.set('time', '%.3f' % result['duration'])
+    ET.SubElement(suite, 'system-out').text = _xml_text(result['output'])
+    return suite
+
+
+def writeJUnitXML(path, results):
+    """Writes **results** to a JUnit XML file at **path**, one
+    ``<testsuite>`` per test program."""
+    root = ET.Element('testsuites', name='cxxtest')
+    suites = [_testsuite(result) for result in results]
+    for key in ('tests', 'failures', 'errors', 'skipped'):
+        root.set(key, str(sum(int(s.get(key)) for s in suites)))
+    root.set('time', '%.3f' % _summary(results)['time'])
+    root.extend(suites)
+    ET.ElementTree(root).write(path, encoding='utf-8', xml_declaration=True)
+
+
+def writeJSON(path, results):
+    """Writes **results** and their summary to a JSON file at **path**."""
+    with open(path, 'w') as f:
+        json.dump({'summary': _summary(results), 'tests': results}, f,
+                  indent=1, sort_keys=True)
+        f.write('\n')
+
+
+def writeReports(base, results):
+    """Writes **results** to ``base.xml`` (JUnit XML) and ``base.json``.
+
+    Each of the **results** is a dictionary with ``name``, ``command``,
+    ``outcome`` (``"passed"``, ``"failed"``, ``"timeout"``, ``"cached"`` or
+    ``"cancelled"``),
+    ``status`` (exit status), ``duration`` (seconds) and ``output`` (captured
+    stdout and stderr, possibly with the middle part omitted) keys.
+    """
+    dirname = os.path.dirname(base)
+    if dirname and not os.path.isdir(dirname):
+        os.makedirs(dirname)
+    results = sorted(results, key=lambda r: r['name'])
+    writeJUnitXML(base + '.xml', results)
+    writeJSON(base + '.json', results)
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
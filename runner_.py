@@ -0,0 +1,1237 @@
+# -*- coding: utf-8 -*-
+"""sconstool.cxxtest.runner_
+
+Machinery used by :class:`sconstool.cxxtest.TestRunnerAction` to run test
+programs.
+
+There normally shouldn't be any need to import this module directly.
+"""
+
+#
+# Copyright (c) 2018-2020 by Paweł Tomulik
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+from .process_ import newSession, waitProcess
+from .profile_ import profiler, shellCommand, usageInfo
+from .report_ import writeReports
+import SCons.Action
+import SCons.Errors
+import SCons.Util
+import atexit
+import codecs
+import collections
+import hashlib
+import json
+import locale
+import os
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+import sys
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+__all__ = ('TIMEOUT_STATUS', 'CANCELLED_STATUS', 'runJobs', 'failFast', 'streamOutput',
+           'showProgress', 'memoryLimit', 'listSuites',
+           'runTests', 'testName', 'session', 'Timings',
+           'ResultCache', 'resultCache', 'loadTimings', 'ChangedFilter',
+           'changedFilter')
+
+
+#: Exit status reported for test programs killed after $CXXTESTTIMEOUT.
+TIMEOUT_STATUS = 124
+
+#: Exit status reported for test programs cancelled in fail-fast mode.
+CANCELLED_STATUS = 125
+
+#: Longest part of a line held back while streaming, longer lines are split.
+MAX_LINE = 65536
+
+
+class _Output(object):
+    """Writes output of test programs to ``sys.stdout`` from any thread.
+
+    Optionally keeps a progress line at the bottom of the terminal, which
+    is erased before, and redrawn after each write.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.status = ''
+
+    def _erase(self):
+        if self.status:
+            sys.stdout.write('\r\033[K')
+
+    def write(self, text):
+        self.writeChunks([text])
+
+    def writeChunks(self, chunks):
+        # chunks of one program are not interleaved with other output
+        with self.lock:
+            self._erase()
+            for text in chunks:
+                sys.stdout.write(text)
+            sys.stdout.write(self.status)
+            sys.stdout.flush()
+
+    def progress(self, status):
+        with self.lock:
+            self._erase()
+            self.status = status
+            sys.stdout.write(status)
+            sys.stdout.flush()
+
+
+_output = _Output()
+
+
+class _NullDecoder(object):
+    def decode(self, data, final=False):
+        return data
+
+
+def _decoder(encoding=None):
+    if isinstance(b'', str):
+        return _NullDecoder()   # python 2
+    if encoding is None:
+        encoding = locale.getpreferredencoding(False)
+    return codecs.getincrementaldecoder(encoding)('replace')
+
+
+class _HeadTail(object):
+    """Keeps the first and the last **maxsize**/2 characters of a text
+    written in pieces. Everything is kept if **maxsize** is 0."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.head = []
+        self.headsize = 0
+        self.tail = collections.deque()
+        self.tailsize = 0
+        self.omitted = 0
+
+    def write(self, text):
+        if not self.maxsize:
+            self.head.append(text)
+            return
+        half = self.maxsize // 2
+        if self.headsize < half:
+            part = text[:half - self.headsize]
+            self.head.append(part)
+            self.headsize += len(part)
+            text = text[len(part):]
+            if not text:
+                return
+        self.tail.append(text)
+        self.tailsize += len(text)
+        excess = self.tailsize - (self.maxsize - half)
+        while excess > 0:
+            first = self.tail[0]
+            if len(first) <= excess:
+                self.tail.popleft()
+                size = len(first)
+            else:
+                self.tail[0] = first[excess:]
+                size = excess
+            self.tailsize -= size
+            self.omitted += size
+            excess -= size
+
+    def getvalue(self):
+        text = ''.join(self.head)
+        if self.omitted:
+            text += '\n[... %d characters omitted ...]\n' % self.omitted
+        return text + ''.join(self.tail)
+
+
+class _Spool(object):
+    """Keeps a text written in pieces in memory, or in a temporary file once
+    it outgrows **maxsize** bytes (never, if **maxsize** is 0)."""
+
+    def __init__(self, maxsize):
+        self.file = tempfile.SpooledTemporaryFile(max_size=maxsize)
+
+    def write(self, text):
+        if not isinstance(text, bytes):
+            text = text.encode('utf-8')
+        self.file.write(text)
+
+    def chunks(self, size=65536):
+        self.file.seek(0)
+        decoder = _decoder('utf-8')
+        while True:
+            data = self.file.read(size)
+            text = decoder.decode(data, not data)
+            if text:
+                yield text
+            if not data:
+                break
+
+    def close(self):
+        self.file.close()
+
+
+def loadTimings(path):
+    """Loads recorded run times of test programs from a JSON file at
+    **path**. Returns a dictionary that maps test names to durations (in
+    seconds), or an empty dictionary if the file does not exist."""
+    try:
+        with open(path) as f:
+            timings = json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+    if not isinstance(timings, dict):
+        return {}
+    return dict((k, float(v)) for k, v in timings.items()
+                if isinstance(v, (int, float)))
+
+
+def runJobs(env):
+    """Returns the number of test programs that may be run simultaneously.
+
+    The number is taken from ``$CXXTESTRUNJOBS``. If it's empty, the value
+    of SCons ``-j`` option is used.
+    """
+    jobs = env.subst('$CXXTESTRUNJOBS')
+    if not jobs:
+        try:
+            import SCons.Script
+            jobs = SCons.Script.GetOption('num_jobs')
+        except Exception:
+            jobs = 1
+    try:
+        return max(1, int(jobs))
+    except ValueError:
+        raise SCons.Errors.UserError('invalid $CXXTESTRUNJOBS: %r' % jobs)
+
+
+def failFast(env):
+    """Whether to stop running test programs after the first failure, either
+    because of ``$CXXTESTFAILFAST`` or ``--cxxtest-fail-fast``."""
+    return bool(_getOption('cxxtest_fail_fast') or env.get('CXXTESTFAILFAST'))
+
+
+def streamOutput(env):
+    """Whether output of test programs is written line by line as it comes,
+    each line prefixed with the name of the program, either because of
+    ``$CXXTESTSTREAM`` or ``--cxxtest-stream``."""
+    return bool(_getOption('cxxtest_stream') or env.get('CXXTESTSTREAM'))
+
+
+def showProgress(env):
+    """Whether a progress line is shown while test programs run, either
+    because of ``$CXXTESTPROGRESS`` or ``--cxxtest-progress``. It's never
+    shown if ``sys.stdout`` is not a terminal."""
+    if not (_getOption('cxxtest_progress') or env.get('CXXTESTPROGRESS')):
+        return False
+    try:
+        return sys.stdout.isatty()
+    except (AttributeError, ValueError):
+        return False
+
+
+def _appendArgs(command, args):
+    if SCons.Util.is_List(command):
+        return list(command) + list(args)
+    if SCons.Util.is_String(command):
+        return ' '.join([command] + list(args))
+    return None
+
+
+def _physicalMemory():
+    # in MiB, 0 if unknown
+    try:
+        pages = os.sysconf('SC_PHYS_PAGES')
+        size = os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return 0
+    return max(0, pages * size // (1024 * 1024))
+
+
+def memoryLimit(env):
+    """Returns memory (MiB) available to test programs run simultaneously,
+    as given by ``$CXXTESTRUNMEMLIMIT`` or the size of physical memory if
+    it's empty. Zero means unlimited."""
+    limit = env.subst('$CXXTESTRUNMEMLIMIT')
+    if not limit:
+        return _physicalMemory()
+    try:
+        return max(0, int(limit))
+    except ValueError:
+        raise SCons.Errors.UserError('invalid $CXXTESTRUNMEMLIMIT: %r' % limit)
+
+
+def listSuites(target, source, env):
+    """Returns names of test suites of the **source** test program, in the
+    order they're run.
+
+    The names are read from the output of ``$CXXTESTRUNCOM --help-tests``
+    (with empty ``$CXXTESTRUNFLAGS``), where ``$CXXTESTRUNCOM`` is taken
+    from the build environment of the program, as :class:`._TestRun` does.
+    An empty list is returned if they can't be obtained this way.
+    """
+    runcom = _programEnv(source, env).get('CXXTESTRUNCOM')
+    command = _appendArgs(runcom, ['--help-tests'])
+    if command is None:
+        return []
+    command = env.Override({'CXXTESTRUNFLAGS': []}).subst(
+        command, target=target, source=[source])
+    try:
+        with open(os.devnull, 'w') as devnull:
+            proc = SCons.Action._subproc(env, command, error='raise',
+                                         shell=True, stdin=None,
+                                         stdout=subprocess.PIPE,
+                                         stderr=devnull)
+            output = proc.communicate()[0]
+    except (OSError, EnvironmentError):
+        return []
+    if proc.returncode != 0:
+        return []
+    # Suite/Test Names
+    # ----------------
+    # MySuite testOne
+    # MySuite testTwo
+    suites = []
+    listing = False
+    for line in _decoder().decode(output, True).splitlines():
+        fields = line.split()
+        if line.startswith('---'):
+            listing = True
+        elif listing and len(fields) == 2 and fields[0] not in suites:
+            suites.append(fields[0])
+    return suites
+
+
+def testName(env, node, suffix='$CXXTESTPROGSUFFIX'):
+    """Returns the name of a test, i.e. path to **node** (relative to the
+    top-level directory) with **suffix** stripped."""
+    path = env.File(node).path.replace(os.sep, '/')
+    suffix = env.subst(suffix)
+    if suffix and path.endswith(suffix):
+        path = path[:-len(suffix)]
+    return path
+
+
+class Timings(object):
+    """Database of test program run times, stored in a JSON file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.data = loadTimings(path)
+        self.recorded = {}
+
+    def get(self, name, default=None):
+        return self.data.get(name, default)
+
+    def record(self, name, duration):
+        self.data[name] = self.recorded[name] = duration
+
+    def save(self):
+        if not self.recorded:
+            return
+        data = loadTimings(self.path)
+        data.update(self.recorded)
+        tmp = '%s.%d.tmp' % (self.path, os.getpid())
+        with open(tmp, 'w') as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+            f.write('\n')
+        if os.path.exists(self.path) and sys.platform == 'win32':
+            os.remove(self.path)
+        os.rename(tmp, self.path)
+        self.recorded = {}
+
+
+class _Session(object):
+    """Collects outcomes of all test programs run by this SCons process.
+
+    The collected data is written out when SCons exits. Test programs are
+    admitted to run only while the sum of their ``$CXXTESTRUNWEIGHT`` fits
+    in :func:`.runJobs` slots and the sum of their ``$CXXTESTRUNMEM`` fits
+    in the smallest non-zero :func:`.memoryLimit`, whichever action runs
+    them.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timings = {}
+        self.durations = {}
+        self.results = {}
+        self.reports = set()
+        self.caches = {}
+        self.slowest = 0
+        self.active = set()
+        self.stopped = False
+        self.progress = False
+        self.counts = {'queued': 0, 'running': 0, 'passed': 0, 'failed': 0}
+        self.admission = threading.Condition(threading.Lock())
+        self.slots = 1
+        self.memory = 0
+        self.used = {'slots': 0, 'memory': 0, 'runs': 0}
+        atexit.register(self.finish)
+
+    def getTimings(self, env):
+        path = env.subst('$CXXTESTTIMINGS')
+        if not path:
+            return None
+        path = env.File(path).abspath
+        with self.lock:
+            try:
+                return self.timings[path]
+            except KeyError:
+                timings = self.timings[path] = Timings(path)
+                return timings
+
+    def configure(self, env):
+        slowest = _getOption('cxxtest_report_slowest')
+        if slowest is None:
+            slowest = env.subst('$CXXTESTREPORTSLOWEST')
+        try:
+            slowest = int(slowest or 0)
+        except ValueError:
+            raise SCons.Errors.UserError('invalid $CXXTESTREPORTSLOWEST: %r'
+                                         % slowest)
+        self.slowest = max(self.slowest, slowest)
+        report = env.subst('$CXXTESTREPORT')
+        if report:
+            self.reports.add(env.File(report).abspath)
+        self.progress = self.progress or showProgress(env)
+        with self.admission:
+            self.slots = max(self.slots, runJobs(env))
+            # the smallest limit wins, whichever action comes first
+            memory = memoryLimit(env)
+            if memory and (not self.memory or memory < self.memory):
+                self.memory = memory
+            self.admission.notify_all()
+
+    def _fits(self, run):
+        used = self.used
+        if not used['runs']:
+            return True     # anything may run alone
+        if used['slots'] + run.weight > self.slots:
+            return False
+        if self.memory and used['memory'] + run.memory > self.memory:
+            return False
+        return True
+
+    def acquire(self, run):
+        """Waits until there are enough free slots and memory for **run**."""
+        with self.admission:
+            while not self._fits(run):
+                self.admission.wait()
+            self.used['slots'] += run.weight
+            self.used['memory'] += run.memory
+            self.used['runs'] += 1
+
+    def release(self, run):
+        with self.admission:
+            self.used['slots'] -= run.weight
+            self.used['memory'] -= run.memory
+            self.used['runs'] -= 1
+            self.admission.notify_all()
+
+    @property
+    def collecting(self):
+        """Whether the outputs of test programs are collected for reports."""
+        return bool(self.reports)
+
+    def queue(self, runs):
+        with self.lock:
+            self.counts['queued'] += len(runs)
+        self.showProgress()
+
+    def begin(self, run):
+        """Registers **run** as running. Returns ``False`` if it shall not
+        start, because another fail-fast run has failed."""
+        with self.lock:
+            self.counts['queued'] -= 1
+            if run.failfast and self.stopped:
+                return False
+            self.active.add(run)
+            self.counts['running'] += 1
+        self.showProgress()
+        return True
+
+    def end(self, run):
+        with self.lock:
+            self.active.discard(run)
+            self.counts['running'] -= 1
+            if run.failed:
+                self.counts['failed'] += 1
+            elif not run.cancelled:
+                self.counts['passed'] += 1
+        self.showProgress()
+
+    def showProgress(self):
+        if not self.progress:
+            return
+        with self.lock:
+            counts = dict(self.counts)
+        if counts['queued'] or counts['running']:
+            status = ('cxxtest: %(passed)d passed, %(failed)d failed, '
+                      '%(running)d running, %(queued)d queued' % counts)
+        else:
+            status = ''
+        _output.progress(status)
+
+    def stop(self, failed):
+        """Cancels fail-fast runs (except **failed**) and doesn't let new
+        ones start."""
+        with self.lock:
+            self.stopped = True
+            runs = [r for r in self.active if r.failfast and r is not failed]
+        for run in runs:
+            run.cancel()
+
+    def record(self, run, timings):
+        with self.lock:
+            self.results[run.name] = run.outcome()
+            if run.cancelled:
+                return
+            self.durations[run.name] = run.duration
+            if timings is not None:
+                timings.record(run.name, run.duration)
+
+    def recordCached(self, name):
+        with self.lock:
+            self.results[name] = {'name': name, 'command': None,
+                                  'outcome': 'cached', 'status': 0,
+                                  'duration': 0.0, 'output': ''}
+
+    def addCache(self, cache):
+        """Schedules eviction of the result **cache** for when SCons
+        exits."""
+        with self.lock:
+            other = self.caches.get(cache.path)
+            if other is None or cache.maxsize < other.maxsize:
+                self.caches[cache.path] = cache
+
+    def finish(self):
+        for cache in self.caches.values():
+            cache.evict()
+        for timings in self.timings.values():
+            try:
+                timings.save()
+            except (IOError, OSError) as e:
+                sys.stderr.write('scons: warning: can not save %s: %s\n'
+                                 % (timings.path, e))
+        for report in self.reports:
+            try:
+                writeReports(report, list(self.results.values()))
+            except (IOError, OSError) as e:
+                sys.stderr.write('scons: warning: can not write %s: %s\n'
+                                 % (report, e))
+        if self.slowest and self.durations:
+            self.reportSlowest(self.slowest)
+
+    def reportSlowest(self, count):
+        durations = sorted(self.durations.items(), key=lambda x: -x[1])
+        sys.stdout.write('scons: slowest test programs:\n')
+        for name, duration in durations[:count]:
+            sys.stdout.write('%10.2fs  %s\n' % (duration, name))
+        sys.stdout.flush()
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def session():
+    """Returns the object that collects outcomes of test programs run by
+    this SCons process."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _Session()
+        return _session
+
+
+def _getOption(name):
+    try:
+        import SCons.Script
+        return SCons.Script.GetOption(name)
+    except Exception:
+        return None
+
+
+def _programEnv(source, env):
+    # Build environment of the test program carries variables overridden
+    # by keyword arguments of CxxTest() or CxxTestProgram() call.
+    try:
+        if source.has_builder():
+            return source.get_build_env()
+    except AttributeError:
+        pass
+    return env
+
+
+def _getInt(env, name):
+    value = env.subst('$' + name)
+    try:
+        return int(value or 0)
+    except ValueError:
+        raise SCons.Errors.UserError('invalid $%s: %r' % (name, value))
+
+
+def _getFloat(env, name):
+    value = env.subst('$' + name)
+    try:
+        return float(value or 0)
+    except ValueError:
+        raise SCons.Errors.UserError('invalid $%s: %r' % (name, value))
+
+
+def _popen(command, env, stdout, group):
+    kw = {}
+    if group:
+        # run in a separate process group, so it can be killed altogether
+        if sys.platform == 'win32':
+            kw['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            kw.update(newSession())
+    if stdout is not None:
+        kw.update(stdout=stdout, stderr=subprocess.STDOUT)
+    return subprocess.Popen(command, env=env, **kw)
+
+
+def _kill(proc, group):
+    if proc.poll() is not None:
+        return
+    try:
+        if not group:
+            proc.kill()
+        elif sys.platform == 'win32':
+            with open(os.devnull, 'w') as devnull:
+                subprocess.call(['taskkill', '/F', '/T', '/PID', str(proc.pid)],
+                                stdout=devnull, stderr=devnull)
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+
+class _TestRun(object):
+    """Runs single test program.
+
+    If **captured** is ``True``, the output of the program is collected and
+    written at once when the program finishes. Up to ``$CXXTESTCAPTUREMAX``
+    bytes are kept in memory, the rest in a temporary file. If **collect**
+    is ``True``, the first and the last ``$CXXTESTCAPTUREMAX``/2 characters
+    of the output are also kept for reports. Programs running longer
+    than ``$CXXTESTTIMEOUT`` seconds are killed together with their
+    children.
+    """
+
+    def __init__(self, action, target, source, env, args, kw, captured,
+                 collect=False, failfast=False, stream=False, progress=False,
+                 suite=None):
+        self.action = action
+        self.target = target
+        self.source = source
+        self.suite = suite
+        self.name = testName(env, source)
+        if suite is not None:
+            self.name += ':' + suite
+        self.env = env
+        self.args = args
+        self.kw = kw
+        self.captured = captured
+        self.collect = collect
+        self.command = None
+        progenv = _programEnv(source, env)
+        self.runcom = progenv.get('CXXTESTRUNCOM')
+        self.capturemax = _getInt(progenv, 'CXXTESTCAPTUREMAX')
+        self.log = _HeadTail(self.capturemax) if collect else None
+        self.timeout = _getFloat(progenv, 'CXXTESTTIMEOUT')
+        self.weight = max(0.0, _getFloat(progenv, 'CXXTESTRUNWEIGHT'))
+        self.memory = max(0.0, _getFloat(progenv, 'CXXTESTRUNMEM'))
+        self.timedout = False
+        self.failfast = failfast
+        self.stream = stream
+        self.progress = progress
+        self.prefix = '[%s] ' % self.name
+        self.pending = ''
+        self.cancelled = False
+        self.group = bool(self.timeout) or failfast
+        self.proc = None
+        self.exited = False
+        self.lock = threading.Lock()
+        self.output = None
+        self.result = None
+        self.duration = 0.0
+        self.usage = None
+        self.profiler = profiler(env)
+
+    def write(self, s):
+        if self.stream:
+            self.writeLines(s)
+        elif self.captured:
+            if self.output is None:
+                self.output = _Spool(self.capturemax)
+            self.output.write(s)
+        else:
+            _output.write(s)
+
+    def writeLines(self, s):
+        lines = (self.pending + s).split('\n')
+        self.pending = lines.pop()
+        if len(self.pending) >= MAX_LINE:
+            lines.append(self.pending)
+            self.pending = ''
+        if lines:
+            prefix = self.prefix
+            _output.write(''.join(prefix + line + '\n' for line in lines))
+
+    def print_cmd_line(self, s, target, source, env):
+        if self.command is None:
+            self.command = s
+        self.write(s + '\n')
+
+    def outcome(self):
+        """Returns a dictionary describing the outcome of the run."""
+        status = getattr(self.result, 'status', self.result) or 0
+        if self.cancelled:
+            outcome = 'cancelled'
+        elif self.timedout:
+            outcome = 'timeout'
+        elif status:
+            outcome = 'failed'
+        else:
+            outcome = 'passed'
+        return {'name': self.name, 'command': self.command,
+                'outcome': outcome, 'status': status,
+                'duration': self.duration, 'output': self.log.getvalue() if self.log else ''}
+
+    def received(self, text):
+        if self.log is not None:
+            self.log.write(text)
+        self.write(text)
+
+    def communicate(self, proc):
+        decoder = _decoder()
+        fd = proc.stdout.fileno()
+        while True:
+            data = os.read(fd, 65536)
+            text = decoder.decode(data, not data)
+            if text:
+                self.received(text)
+            if not data:
+                break
+        proc.stdout.close()
+        return waitProcess(proc)
+
+    @property
+    def failed(self):
+        status = getattr(self.result, 'status', self.result)
+        return bool(status) and not self.cancelled
+
+    def kill(self):
+        proc = self.proc
+        if proc is not None:
+            _kill(proc, self.group)
+
+    def expire(self):
+        self.timedout = True
+        self.kill()
+
+    def cancel(self):
+        """Cancels the run, unless its program has already exited."""
+        with self.lock:
+            proc = self.proc
+            if self.exited or (proc is not None and proc.poll() is not None):
+                return
+            self.cancelled = True
+        self.kill()
+
+    def spawn(self, sh, escape, cmd, args, env):
+        piped = self.captured or self.collect or self.stream or self.progress
+        stdout = subprocess.PIPE if piped else None
+        proc = _popen(shellCommand(sh, escape, args), env, stdout,
+                      group=self.group)
+        with self.lock:
+            self.proc = proc
+        if self.cancelled:
+            # cancelled while starting
+            self.kill()
+        timer = None
+        if self.timeout:
+            timer = threading.Timer(self.timeout, self.expire)
+            timer.daemon = True
+            timer.start()
+        try:
+            if piped:
+                self.usage = self.communicate(proc)
+            else:
+                self.usage = waitProcess(proc)
+        except BaseException:
+            self.kill()
+            raise
+        finally:
+            if timer is not None:
+                timer.cancel()
+            with self.lock:
+                self.proc = None
+                self.exited = True
+                if self.cancelled and hasattr(signal, 'SIGKILL') and \
+                   proc.returncode != -signal.SIGKILL:
+                    # exited by itself before it got killed
+                    self.cancelled = False
+        if self.cancelled:
+            self.write("Test program `%s' cancelled after a failure\n"
+                       % self.name)
+        elif self.timedout:
+            self.write("Test program `%s' timed out after %g seconds\n"
+                       % (self.name, self.timeout))
+            return TIMEOUT_STATUS
+        return proc.returncode
+
+    def __call__(self):
+        s = session()
+        s.acquire(self)
+        try:
+            if not s.begin(self):
+                self.cancelled = True
+                return None
+            try:
+                self.result = self._run()
+            finally:
+                s.end(self)
+        finally:
+            s.release(self)
+        if self.cancelled:
+            self.result = None
+        elif self.failfast and self.failed:
+            s.stop(self)
+        return self.result
+
+    def _run(self):
+        env = self.env
+        overrides = {}
+        if self.suite is not None:
+            # CxxTest runners take the name of the suite to run
+            overrides['CXXTESTRUNCOM'] = _appendArgs(self.runcom,
+                                                     [self.suite])
+        if self.captured or self.collect or self.stream or self.progress or \
+           self.group or self.profiler:
+            overrides.update({'SPAWN': self.spawn,
+                              'PRINT_CMD_LINE_FUNC': self.print_cmd_line})
+        if overrides:
+            env = env.Override(overrides)
+        start = time.time()
+        result = None
+        try:
+            result = self.action(self.target, [self.source], env,
+                                 *self.args, **self.kw)
+        finally:
+            self.duration = time.time() - start
+            self.flush()
+            if self.profiler is not None:
+                status = getattr(result, 'status', result) or 0
+                self.profiler.record(self.name, 'run', start, self.duration,
+                                     target=str(self.source), status=status,
+                                     **usageInfo(self.usage))
+        return result
+
+    def flush(self):
+        if self.pending:
+            _output.write(self.prefix + self.pending + '\n')
+            self.pending = ''
+        if self.output is None:
+            return
+        try:
+            _output.writeChunks(self.output.chunks())
+        finally:
+            self.output.close()
+            self.output = None
+
+
+def _runParallel(runs, jobs):
+    errors = []
+    tasks = queue.Queue()
+    for run in runs:
+        tasks.put(run)
+
+    def worker():
+        while not errors:
+            try:
+                run = tasks.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                run()
+            except BaseException:
+                errors.append(sys.exc_info())
+
+    threads = [threading.Thread(target=worker)
+               for _ in range(min(jobs, len(runs)))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    try:
+        for thread in threads:
+            thread.join()
+    except BaseException:
+        # e.g. KeyboardInterrupt, don't leave the test programs behind
+        errors.append(sys.exc_info())
+        for run in runs:
+            run.kill()
+        raise
+    if errors:
+        raise errors[0][1]
+
+
+def runTests(action, target, source, env, *args, **kw):
+    """Runs **action** for each of **source** test programs.
+
+    Up to :func:`.runJobs` programs are run simultaneously, longest running
+    programs (according to ``$CXXTESTTIMINGS``) first. Run times are
+    recorded there, except when running a ``$CXXTESTSHARD``. In parallel mode,
+    output of each test program is collected and written to ``sys.stdout``
+    at once, when the program finishes. Returns a list of results, in the
+    same order as **source**.
+
+    In :func:`.streamOutput` mode, output of the programs is written as it
+    comes, line by line, each line prefixed with the name of the program.
+
+    In :func:`.failFast` mode, no more programs are started after the first
+    failure and the ones still running are killed. Results of programs that
+    didn't complete are ``None``.
+
+    Suites of programs with ``$CXXTESTSPLITSUITES`` set are run as separate
+    processes (see :func:`.listSuites`), the result of such a program is
+    the first non-zero result of its suites.
+    """
+    units = []
+    for src in source:
+        suites = []
+        if SCons.Action.execute_actions and \
+           _programEnv(src, env).get('CXXTESTSPLITSUITES'):
+            suites = listSuites(target, src, env)
+        if len(suites) > 1:
+            units.extend((src, suite) for suite in suites)
+        else:
+            units.append((src, None))
+    jobs = runJobs(env)
+    parallel = jobs > 1 and len(units) > 1
+    s = session()
+    s.configure(env)
+    timings = s.getTimings(env)
+    failfast = failFast(env)
+    stream = streamOutput(env)
+    runs = [_TestRun(action, target, src, env, args, kw,
+                     parallel and not stream, s.collecting, failfast, stream,
+                     s.progress, suite)
+            for src, suite in units]
+    s.queue(runs)
+    if parallel:
+        queued = runs
+        if timings is not None:
+            unknown = float('inf')
+            queued = sorted(runs, key=lambda r: -timings.get(r.name, unknown))
+        _runParallel(queued, jobs)
+    else:
+        for run in runs:
+            run()
+    cancelled = len([run for run in runs if run.cancelled])
+    if cancelled:
+        _output.write('Cancelled %d test program(s) after a failure\n'
+                      % cancelled)
+    if SCons.Action.execute_actions:
+        if env.subst('$CXXTESTSHARD'):
+            # Shards are planned from $CXXTESTTIMINGS, which must not change
+            # in between the runs of shards, or they wouldn't add up
+            timings = None
+        for run in runs:
+            s.record(run, timings)
+    results = collections.OrderedDict((src, 0) for src in source)
+    for run in runs:
+        if run.result is None:
+            if results[run.source] == 0:
+                results[run.source] = None
+        elif run.result != 0 and not results[run.source]:
+            results[run.source] = run.result
+    return list(results.values())
+
+
+class ResultCache(object):
+    """Content-addressed cache of passed test program runs.
+
+    An entry is keyed by the content signature of the test program, the
+    expanded ``$CXXTESTRUNCOM`` and values of selected variables from the
+    run environment (``$ENV``). Least recently used entries are removed once
+    the total size of the cache exceeds **maxsize** bytes.
+    """
+
+    def __init__(self, path, maxsize=0, variables=()):
+        self.path = path
+        self.maxsize = maxsize
+        self.variables = list(variables)
+        self._keys = {}
+
+    def key(self, target, source, env):
+        command = env.subst('$CXXTESTRUNCOM', target=target, source=[source])
+        ENV = env.get('ENV', {})
+        items = [source.get_csig(), command]
+        items += ['%s=%s' % (v, ENV.get(v, '')) for v in self.variables]
+        return hashlib.sha1('\0'.join(items).encode('utf-8')).hexdigest()
+
+    def entry(self, key):
+        return os.path.join(self.path, key[:2], key)
+
+    def filter(self, target, source, env):
+        """Returns these of **source** nodes, that have no cached result."""
+        missing = []
+        for src in source:
+            key = self.key(target, src, env)
+            entry = self.entry(key)
+            if os.path.isfile(entry):
+                try:
+                    os.utime(entry, None)
+                except OSError:
+                    pass
+                session().recordCached(testName(env, src))
+                if SCons.Action.print_actions:
+                    _output.write("Retrieved test result for `%s' from "
+                                  "cache\n" % src)
+            else:
+                self._keys[src] = key
+                missing.append(src)
+        return missing
+
+    def update(self, source, results):
+        """Stores passed results in cache."""
+        for src, result in zip(source, results):
+            if result == 0 and src in self._keys:
+                self.store(self._keys[src], {'source': str(src)})
+        if self.maxsize:
+            session().addCache(self)
+
+    def store(self, key, data):
+        entry = self.entry(key)
+        dirname = os.path.dirname(entry)
+        tmp = '%s.%d.tmp' % (entry, os.getpid())
+        try:
+            if not os.path.isdir(dirname):
+                os.makedirs(dirname)
+            with open(tmp, 'w') as f:
+                json.dump(data, f)
+            if os.path.exists(entry) and sys.platform == 'win32':
+                os.remove(entry)
+            os.rename(tmp, entry)
+        except (IOError, OSError):
+            # the cache is just an optimization
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    def evict(self):
+        """Removes least recently used entries, until the cache fits in
+        **maxsize** bytes. Called once, when SCons exits."""
+        if not self.maxsize:
+            return
+        entries = []
+        for dirpath, _, filenames in os.walk(self.path):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        total = sum(e[1] for e in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.maxsize:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+
+def resultCache(env):
+    """Returns :class:`.ResultCache` configured by **env**, or ``None`` if
+    result caching is disabled."""
+    path = env.subst('$CXXTESTRESULTCACHE')
+    if not path or not SCons.Action.execute_actions:
+        return None
+    maxsize = env.subst('$CXXTESTRESULTCACHESIZE')
+    try:
+        maxsize = int(maxsize or 0)
+    except ValueError:
+        raise SCons.Errors.UserError('invalid $CXXTESTRESULTCACHESIZE: %r'
+                                     % maxsize)
+    return ResultCache(env.Dir(path).abspath, maxsize,
+                       env.Split('$CXXTESTRESULTCACHEENV'))
+
+
+class ChangedFilter(object):
+    """Selects test programs, whose inputs changed since they last passed.
+
+    The inputs of a program are all the nodes it depends on, transitively,
+    as known to SCons (objects, generated sources, test headers, included
+    headers, libraries, explicit dependencies). Their content signatures,
+    together with the expanded ``$CXXTESTRUNCOM``, make up a signature of
+    the program. Signatures of passed programs are stored in a JSON file at
+    **path**.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.data = self.load()
+        self.recorded = {}
+        self._csigs = {}
+        self._keys = {}
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        return data
+
+    def _csig(self, node):
+        try:
+            return self._csigs[node]
+        except KeyError:
+            pass
+        try:
+            csig = node.get_csig()
+        except (AttributeError, OSError, SCons.Errors.UserError):
+            csig = None
+        self._csigs[node] = csig
+        return csig
+
+    def inputs(self, node):
+        """Returns a sorted list of paths and content signatures of all the
+        nodes **node** depends on, including **node** itself."""
+        seen = set([node])
+        stack = [node]
+        items = []
+        while stack:
+            n = stack.pop()
+            csig = self._csig(n)
+            if csig is not None:
+                items.append('%s=%s' % (n.get_abspath(), csig))
+            for child in n.children():
+                if child not in seen:
+                    seen.add(child)
+                    stack.append(child)
+        return sorted(items)
+
+    def key(self, target, source, env):
+        command = env.subst('$CXXTESTRUNCOM', target=target, source=[source])
+        items = [command] + self.inputs(source)
+        return hashlib.sha1('\0'.join(items).encode('utf-8')).hexdigest()
+
+    def filter(self, target, source, env):
+        """Returns these of **source** nodes, whose inputs changed since they
+        last passed."""
+        changed = []
+        for src in source:
+            name = testName(env, src)
+            key = self.key(target, src, env)
+            with self.lock:
+                unchanged = self.data.get(name) == key
+            if unchanged:
+                session().recordCached(name)
+                if SCons.Action.print_actions:
+                    _output.write("Skipping test program `%s', its inputs "
+                                  "did not change since it passed\n" % src)
+            else:
+                self._keys[src] = (name, key)
+                changed.append(src)
+        return changed
+
+    def update(self, source, results):
+        """Records signatures of passed **source** programs."""
+        with self.lock:
+            for src, result in zip(source, results):
+                if src not in self._keys:
+                    continue
+                name, key = self._keys.pop(src)
+                if result is None:
+                    continue    # cancelled, not known to pass or fail
+                if result == 0:
+                    self.data[name] = self.recorded[name] = key
+                else:
+                    # must run again, even if reverted to the passed state
+                    self.data.pop(name, None)
+                    self.recorded[name] = None
+            self.save()
+
+    def save(self):
+        if not self.recorded:
+            return
+        data = self.load()
+        for name, key in self.recorded.items():
+            if key is None:
+                data.pop(name, None)
+            else:
+                data[name] = key
+        dirname = os.path.dirname(self.path)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        tmp = '%s.%d.tmp' % (self.path, os.getpid())
+        with open(tmp, 'w') as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+            f.write('\n')
+        if os.path.exists(self.path) and sys.platform == 'win32':
+            os.remove(self.path)
+        os.rename(tmp, self.path)
+        self.recorded = {}
+
+
+_changedFilters = {}
+_changedFilters_lock = threading.Lock()
+
+
+def changedFilter(env):
+    """Returns :class:`.ChangedFilter` for ``$CXXTESTCHANGED``, or ``None``
+    if all test programs shall be run."""
+    path = env.subst('$CXXTESTCHANGED')
+    if not path or not SCons.Action.execute_actions:
+        return None
+    path = env.File(path).abspath
+    with _changedFilters_lock:
+        try:
+            return _changedFilters[path]
+        except KeyError:
+            filt = _changedFilters[path] = ChangedFilter(path)
+            return filt
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -44,6 +44,10 @@ except OSError:
 
 test.file_fixture('../../../../__init__.py', 'site_scons/site_tools/cxxtest/__init__.py')
 test.file_fixture('../../../../about.py', 'site_scons/site_tools/cxxtest/about.py')
+test.file_fixture('../../../../process_.py', 'site_scons/site_tools/cxxtest/process_.py')
+test.file_fixture('../../../../profile_.py', 'site_scons/site_tools/cxxtest/profile_.py')
+test.file_fixture('../../../../report_.py', 'site_scons/site_tools/cxxtest/report_.py')
+test.file_fixture('../../../../runner_.py', 'site_scons/site_tools/cxxtest/runner_.py')
 
 test.subdir('src')
 
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018-2020 by Paweł Tomulik <ptomulik@meil.pw.edu.pl>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import TestSCons
+import sys
+import os
+import json
+
+_exe = TestSCons._exe
+_obj = TestSCons._obj
+
+if sys.platform == 'win32':
+    test = TestSCons.TestSCons(program='scons.bat', interpreter=None)
+else:
+    test = TestSCons.TestSCons()
+
+test.subdir('cxxtest')
+try:
+    test.dir_fixture('../../../../cxxtest', 'cxxtest')
+except OSError:
+    # test with other cxxtest, if there is no cxxtest in project tree
+    pass
+
+def find_line(content, line):
+    return line in [s.strip() for s in content.splitlines()]
+
+test.file_fixture('../../../../__init__.py', 'site_scons/site_tools/cxxtest/__init__.py')
+test.file_fixture('../../../../about.py', 'site_scons/site_tools/cxxtest/about.py')
+test.file_fixture('../../../../process_.py', 'site_scons/site_tools/cxxtest/process_.py')
+test.file_fixture('../../../../profile_.py', 'site_scons/site_tools/cxxtest/profile_.py')
+test.file_fixture('../../../../report_.py', 'site_scons/site_tools/cxxtest/report_.py')
+test.file_fixture('../../../../runner_.py', 'site_scons/site_tools/cxxtest/runner_.py')
+
+test.write('MyTestSuite1.t.h', r"""\
+// MyTestSuite1.t.h
+#include <cxxtest/TestSuite.h>
+#include <cstdio>
+class MyTestSuite1 : public CxxTest::TestSuite
+{
+public:
+void testVerbose(void)
+{
+  for(int i = 0; i < 10000; ++i)
+    std::printf("verbose line %d\n", i);
+  TS_ASSERT_EQUALS(1 + 1, 2);
+}
+};
+""")
+
+test.write('MyTestSuite2.t.h', r"""\
+// MyTestSuite2.t.h
+#include <cxxtest/TestSuite.h>
+class MyTestSuite2 : public CxxTest::TestSuite
+{
+public:
+void testAddition(void)
+{
+  TS_ASSERT_EQUALS(2 + 2, 4);
+}
+};
+""")
+
+test.write('SConstruct', r"""\
+import sconstool.loader
+sconstool.loader.extend_toolpath(transparent=True)
+env = Environment(tools=['default', 'cxxtest'], CXXTESTREPORT='#reports/cxxtest',
+                  CXXTESTCAPTUREMAX=1024)
+env.CxxTest(['MyTestSuite1.t.h', 'MyTestSuite2.t.h'])
+""")
+
+lines = ['verbose line %d' % i for i in (0, 1, 5000, 9998, 9999)]
+
+# Complete output is written, although it does not fit in memory
+test.run(['-j', '2', 'check'])
+test.must_contain_all_lines(test.stdout(), lines, find_line)
+
+# Reports keep the beginning and the end of the output only
+report = json.loads(test.read(['reports', 'cxxtest.json'], mode='r'))
+tests = dict((t['name'], t) for t in report['tests'])
+output = tests['MyTestSuite1']['output']
+test.fail_test(len(output) > 1024 + 64)
+test.fail_test('verbose line 0' not in output)
+test.fail_test('verbose line 5000' in output)
+test.fail_test('verbose line 9999' not in output)
+test.fail_test('characters omitted ...]' not in output)
+test.fail_test('characters omitted' in tests['MyTestSuite2']['output'])
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018-2020 by Paweł Tomulik <ptomulik@meil.pw.edu.pl>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import TestSCons
+import sys
+import os
+import json
+
+_exe = TestSCons._exe
+_obj = TestSCons._obj
+
+if sys.platform == 'win32':
+    test = TestSCons.TestSCons(program='scons.bat', interpreter=None)
+else:
+    test = TestSCons.TestSCons()
+
+test.subdir('cxxtest')
+try:
+    test.dir_fixture('../../../../cxxtest', 'cxxtest')
+except OSError:
+    # test with other cxxtest, if there is no cxxtest in project tree
+    pass
+
+def find_line(content, line):
+    return line in [s.strip() for s in content.splitlines()]
+
+test.file_fixture('../../../../__init__.py', 'site_scons/site_tools/cxxtest/__init__.py')
+test.file_fixture('../../../../about.py', 'site_scons/site_tools/cxxtest/about.py')
+test.file_fixture('../../../../process_.py', 'site_scons/site_tools/cxxtest/process_.py')
+test.file_fixture('../../../../profile_.py', 'site_scons/site_tools/cxxtest/profile_.py')
+test.file_fixture('../../../../report_.py', 'site_scons/site_tools/cxxtest/report_.py')
+test.file_fixture('../../../../runner_.py', 'site_scons/site_tools/cxxtest/runner_.py')
+
+test.write('MyTestSuite1.t.h', r"""\
+// MyTestSuite1.t.h
+#include <cxxtest/TestSuite.h>
+#include <chrono>
+#include <thread>
+class MyTestSuite1 : public CxxTest::TestSuite
+{
+public:
+void testAddition(void)
+{
+  // fail after the other programs are done, when run in parallel
+  std::this_thread::sleep_for(std::chrono::seconds(1));
+  TS_ASSERT_EQUALS(1 + 1, 3);
+}
+};
+""")
+
+test.write('MyTestSuite2.t.h', r"""\
+// MyTestSuite2.t.h
+#include <cxxtest/TestSuite.h>
+class MyTestSuite2 : public CxxTest::TestSuite
+{
+public:
+void testAddition(void)
+{
+  TS_ASSERT_EQUALS(2 + 2, 4);
+}
+};
+""")
+
+test.write('MyTestSuite3.t.h', r"""\
+// MyTestSuite3.t.h
+#include <cxxtest/TestSuite.h>
+class MyTestSuite3 : public CxxTest::TestSuite
+{
+public:
+void testAddition(void)
+{
+  TS_ASSERT_EQUALS(3 + 3, 6);
+}
+};
+""")
+
+test.write('SConstruct', r"""\
+import sconstool.loader
+sconstool.loader.extend_toolpath(transparent=True)
+env = Environment(tools=['default', 'cxxtest'], CXXTESTREPORT='#reports/cxxtest',
+                  CXXTESTFAILFAST=ARGUMENTS.get('FAILFAST', False),
+                  CXXTESTRUNSTAMP=ARGUMENTS.get('STAMP', False))
+env.CxxTest(['MyTestSuite1.t.h', 'MyTestSuite2.t.h', 'MyTestSuite3.t.h'])
+""")
+
+def outcomes():
+    report = json.loads(test.read(['reports', 'cxxtest.json'], mode='r'))
+    return dict((t['name'], t['outcome']) for t in report['tests'])
+
+# All programs are run by default
+test.run(['check'], status=2, stderr=None)
+test.fail_test('Expected (1 + 1 == 3), found (2 != 3)' not in test.stdout())
+test.fail_test(outcomes() != {'MyTestSuite1': 'failed',
+                              'MyTestSuite2': 'passed',
+                              'MyTestSuite3': 'passed'})
+
+# Fail-fast mode stops after the first failure, which is still reported
+cancelled = {'MyTestSuite1': 'failed',
+             'MyTestSuite2': 'cancelled',
+             'MyTestSuite3': 'cancelled'}
+test.run(['check', 'FAILFAST=1'], status=2, stderr=None)
+test.fail_test('Expected (1 + 1 == 3), found (2 != 3)' not in test.stdout())
+test.must_contain_all_lines(test.stdout(), ['Cancelled 2 test program(s) after a failure'], find_line)
+test.must_not_contain_any_line(test.stdout(), [test.workpath('MyTestSuite2')], find_line)
+test.fail_test(outcomes() != cancelled)
+
+test.run(['check', '--cxxtest-fail-fast'], status=2, stderr=None)
+test.must_contain_all_lines(test.stdout(), ['Cancelled 2 test program(s) after a failure'], find_line)
+test.fail_test(outcomes() != cancelled)
+
+# In parallel, the failure is reported as well, and programs which have
+# already finished keep their outcomes
+test.run(['-j', '3', 'check', 'FAILFAST=1'], status=2, stderr=None)
+test.fail_test('Expected (1 + 1 == 3), found (2 != 3)' not in test.stdout())
+test.must_not_contain_any_line(test.stdout(), ['Cancelled 2 test program(s) after a failure',
+                                               'Cancelled 1 test program(s) after a failure'], find_line)
+test.fail_test(outcomes() != {'MyTestSuite1': 'failed',
+                              'MyTestSuite2': 'passed',
+                              'MyTestSuite3': 'passed'})
+
+# Cancelled programs are not stamped as passed, so they run next time
+test.run(['-k', 'check', 'STAMP=1', 'FAILFAST=1'], status=2, stderr=None)
+test.fail_test(outcomes() != cancelled)
+test.must_not_exist('MyTestSuite1.passed')
+test.must_not_exist('MyTestSuite2.passed')
+test.must_not_exist('MyTestSuite3.passed')
+
+test.run(['-k', 'check', 'STAMP=1'], status=2, stderr=None)
+test.fail_test(outcomes() != {'MyTestSuite1': 'failed',
+                              'MyTestSuite2': 'passed',
+                              'MyTestSuite3': 'passed'})
+test.must_not_exist('MyTestSuite1.passed')
+test.must_exist('MyTestSuite2.passed')
+test.must_exist('MyTestSuite3.passed')
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
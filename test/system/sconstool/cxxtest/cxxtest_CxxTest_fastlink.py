@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018-2020 by Paweł Tomulik <ptomulik@meil.pw.edu.pl>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import TestSCons
+import sys
+import os
+
+_exe = TestSCons._exe
+_obj = TestSCons._obj
+
+if sys.platform == 'win32':
+    test = TestSCons.TestSCons(program='scons.bat', interpreter=None)
+else:
+    test = TestSCons.TestSCons()
+
+if sys.platform in ('win32', 'cygwin', 'darwin'):
+    test.skip_test('Fast link mode is supported on ELF platforms only\n')
+
+test.subdir('cxxtest')
+try:
+    test.dir_fixture('../../../../cxxtest', 'cxxtest')
+except OSError:
+    # test with other cxxtest, if there is no cxxtest in project tree
+    pass
+
+def find_line(content, line):
+    return line in [s.strip() for s in content.splitlines()]
+
+test.file_fixture('../../../../__init__.py', 'site_scons/site_tools/cxxtest/__init__.py')
+test.file_fixture('../../../../about.py', 'site_scons/site_tools/cxxtest/about.py')
+test.file_fixture('../../../../process_.py', 'site_scons/site_tools/cxxtest/process_.py')
+test.file_fixture('../../../../profile_.py', 'site_scons/site_tools/cxxtest/profile_.py')
+test.file_fixture('../../../../report_.py', 'site_scons/site_tools/cxxtest/report_.py')
+test.file_fixture('../../../../runner_.py', 'site_scons/site_tools/cxxtest/runner_.py')
+
+test.write('MyTestSuite1.t.h', r"""\
+// MyTestSuite1.t.h
+#include <cxxtest/TestSuite.h>
+class MyTestSuite1 : public CxxTest::TestSuite
+{
+public:
+void testAddition(void)
+{
+  TS_ASSERT(1 + 1 > 1);
+  TS_ASSERT_EQUALS(1 + 1, 2);
+}
+};
+""")
+
+test.write('MyTestSuite2.t.h', r"""\
+// MyTestSuite2.t.h
+#include <cxxtest/TestSuite.h>
+class MyTestSuite2 : public CxxTest::TestSuite
+{
+public:
+void testAddition(void)
+{
+  TS_ASSERT(2 + 2 > 2);
+  TS_ASSERT_EQUALS(2 + 2, 4);
+}
+};
+""")
+
+test.write('MyTestSuite3.t.h', r"""\
+// MyTestSuite3.t.h
+#include <cxxtest/TestSuite.h>
+class MyTestSuite3 : public CxxTest::TestSuite
+{
+public:
+void testAddition(void)
+{
+  TS_ASSERT(3 + 3 > 3);
+  TS_ASSERT_EQUALS(3 + 3, 6);
+}
+};
+""")
+
+test.write('main.cpp', r"""\
+int main() { return 0; }
+""")
+
+test.write('SConstruct', r"""\
+import sconstool.loader
+sconstool.loader.extend_toolpath(transparent=True)
+env = Environment(tools=['default', 'cxxtest'],
+                  CXXTESTFASTLINK=ARGUMENTS.get('FASTLINK', False),
+                  CXXTESTCCFLAGS=ARGUMENTS.get('CCFLAGS', '$CCFLAGS'))
+if 'BOGUS' in ARGUMENTS:
+    env.PrependENVPath('PATH', Dir('bin').abspath)
+    env.Prepend(CXXTESTFASTLINKERS=['bogus'])
+env.CxxTest(['MyTestSuite1.t.h', 'MyTestSuite2.t.h'])
+env.CxxTest(['MyTestSuite3.t.h'], CXXTESTFASTLINK=True)
+env.Program('main', 'main.cpp')
+""")
+
+def compiled_with(content, name, flag):
+    return any(name in s.split() and flag in s.split() for s in content.splitlines())
+
+programs = [test.workpath('MyTestSuite%d' % i) for i in (1, 2, 3)]
+
+# Only the tests declared with CXXTESTFASTLINK=True
+test.run(['check', 'main'])
+test.must_contain_all_lines(test.stdout(), programs, find_line)
+test.fail_test(compiled_with(test.stdout(), 'MyTestSuite1.t.cpp', '-gsplit-dwarf'))
+test.fail_test(not compiled_with(test.stdout(), 'MyTestSuite3.t.cpp', '-gsplit-dwarf'))
+test.must_exist('MyTestSuite3.t.dwo')
+
+# All tests, production binaries are not affected
+test.run(['-c', 'check', 'main'])
+test.must_not_exist('MyTestSuite3.t.dwo')
+test.run(['check', 'main', 'FASTLINK=1'])
+test.must_contain_all_lines(test.stdout(), programs, find_line)
+test.fail_test(not compiled_with(test.stdout(), 'MyTestSuite1.t.cpp', '-gsplit-dwarf'))
+test.fail_test(compiled_with(test.stdout(), 'main.cpp', '-gsplit-dwarf'))
+for linker in ('mold', 'lld', 'gold'):
+    if test.where_is('ld.%s' % linker):
+        test.fail_test(not compiled_with(test.stdout(), 'MyTestSuite1', '-fuse-ld=%s' % linker))
+        test.fail_test(compiled_with(test.stdout(), 'main', '-fuse-ld=%s' % linker))
+        break
+
+# Options are appended to $CXXTESTCCFLAGS set by user
+test.run(['-c', 'check', 'main'])
+test.run(['check', 'FASTLINK=1', 'CCFLAGS=-O1'])
+test.fail_test(not compiled_with(test.stdout(), 'MyTestSuite1.t.cpp', '-gsplit-dwarf'))
+test.fail_test(not compiled_with(test.stdout(), 'MyTestSuite1.t.cpp', '-O1'))
+
+# Linkers the compiler doesn't accept are skipped
+test.subdir('bin')
+test.write(['bin', 'ld.bogus'], '#!/bin/sh\nexit 0\n')
+os.chmod(test.workpath('bin', 'ld.bogus'), 0o755)
+test.run(['-c', 'check', 'main'])
+test.run(['check', 'FASTLINK=1', 'BOGUS=1'])
+test.must_contain_all_lines(test.stdout(), programs, find_line)
+test.fail_test(compiled_with(test.stdout(), 'MyTestSuite1', '-fuse-ld=bogus'))
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
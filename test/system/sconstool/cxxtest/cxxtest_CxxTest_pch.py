@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018-2020 by Paweł Tomulik <ptomulik@meil.pw.edu.pl>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import TestSCons
+import sys
+import os
+
+_exe = TestSCons._exe
+_obj = TestSCons._obj
+
+if sys.platform == 'win32':
+    test = TestSCons.TestSCons(program='scons.bat', interpreter=None)
+else:
+    test = TestSCons.TestSCons()
+
+if sys.platform == 'win32':
+    test.skip_test('Precompiled headers are supported with GCC and Clang only\n')
+
+test.subdir('cxxtest')
+try:
+    test.dir_fixture('../../../../cxxtest', 'cxxtest')
+except OSError:
+    # test with other cxxtest, if there is no cxxtest in project tree
+    pass
+
+def find_line(content, line):
+    return line in [s.strip() for s in content.splitlines()]
+
+test.file_fixture('../../../../__init__.py', 'site_scons/site_tools/cxxtest/__init__.py')
+test.file_fixture('../../../../about.py', 'site_scons/site_tools/cxxtest/about.py')
+test.file_fixture('../../../../process_.py', 'site_scons/site_tools/cxxtest/process_.py')
+test.file_fixture('../../../../profile_.py', 'site_scons/site_tools/cxxtest/profile_.py')
+test.file_fixture('../../../../report_.py', 'site_scons/site_tools/cxxtest/report_.py')
+test.file_fixture('../../../../runner_.py', 'site_scons/site_tools/cxxtest/runner_.py')
+
+test.write('Fixture.h', r"""\
+// Fixture.h
+#ifndef FIXTURE_H
+#define FIXTURE_H
+inline int fixture(void) { return 2; }
+#endif
+""")
+
+test.write('MyTestSuite1.t.h', r"""\
+// MyTestSuite1.t.h
+#include <cxxtest/TestSuite.h>
+class MyTestSuite1 : public CxxTest::TestSuite
+{
+public:
+void testAddition(void)
+{
+  TS_ASSERT_EQUALS(1 + 1, fixture());
+}
+};
+""")
+
+test.write('MyTestSuite2.t.h', r"""\
+// MyTestSuite2.t.h
+#include <cxxtest/TestSuite.h>
+class MyTestSuite2 : public CxxTest::TestSuite
+{
+public:
+void testAddition(void)
+{
+  TS_ASSERT_EQUALS(2 + 2, 2 * fixture());
+}
+};
+""")
+
+test.write('MyTestSuite3.t.h', r"""\
+// MyTestSuite3.t.h
+#include <cxxtest/TestSuite.h>
+#include <vector>
+class MyTestSuite3 : public CxxTest::TestSuite
+{
+public:
+void testSize(void)
+{
+  TS_ASSERT_EQUALS(std::vector<int>(3).size(), 3u);
+}
+};
+""")
+
+test.write('SConstruct', r"""\
+import sconstool.loader
+sconstool.loader.extend_toolpath(transparent=True)
+env = Environment(tools=['default', 'cxxtest'], CPPPATH=['.'],
+                  CXXTESTPCH='cxxtest_pch', CXXTESTPCHHEADERS=['Fixture.h'],
+                  CXXTESTCPPFLAGS=ARGUMENTS.get('CPPFLAGS', '$CPPFLAGS'))
+env.CxxTest(['MyTestSuite1.t.h', 'MyTestSuite2.t.h'])
+if 'OTHERPCH' in ARGUMENTS:
+    env.CxxTest(['MyTestSuite3.t.h'], CXXTESTPCH=ARGUMENTS['OTHERPCH'],
+                CXXTESTPCHHEADERS=['vector'])
+""")
+
+test.run()  # nothing should happen .. but it happens unfortunatelly
+test.must_not_exist('cxxtest_pch.h')
+
+test.run(['check'])
+test.must_contain_all_lines(test.stdout(), [test.workpath('MyTestSuite1'), test.workpath('MyTestSuite2')], find_line)
+test.must_contain_all_lines(test.stdout(), ['Running cxxtest tests (1 test)'])
+
+test.must_contain('cxxtest_pch.h', '#include "cxxtest/TestSuite.h"\n#include "Fixture.h"\n')
+test.must_contain_all_lines(test.stdout(), ['-x c++-header'])
+test.must_exist('MyTestSuite1%s' % _exe)
+test.must_exist('MyTestSuite2%s' % _exe)
+
+test.run(['-c', 'check'])
+test.must_not_exist('cxxtest_pch.h')
+test.must_not_exist('MyTestSuite1%s' % _exe)
+
+# Options of the precompiled header are appended to $CXXTESTCPPFLAGS
+test.run(['check', 'CPPFLAGS=-DMY_FLAG'])
+test.fail_test(not any('-DMY_FLAG' in s.split() and '-include' in s.split() and
+                       'MyTestSuite1.t.cpp' in s.split()
+                       for s in test.stdout().splitlines()))
+test.run(['-c', 'check'])
+
+# Programs with other headers can't share the precompiled header
+test.run(['check', 'OTHERPCH=cxxtest_pch'], status=2, stderr=None)
+test.must_contain_all_lines(test.stderr(), ['cxxtest_pch is already used as $CXXTESTPCH with different settings'])
+
+test.run(['check', 'OTHERPCH=cxxtest_vector_pch'])
+test.must_contain('cxxtest_vector_pch.h', '#include "cxxtest/TestSuite.h"\n#include "vector"\n')
+test.must_exist('MyTestSuite3%s' % _exe)
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018-2020 by Paweł Tomulik <ptomulik@meil.pw.edu.pl>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import TestSCons
+import json
+import sys
+import os
+
+_exe = TestSCons._exe
+_obj = TestSCons._obj
+
+if sys.platform == 'win32':
+    test = TestSCons.TestSCons(program='scons.bat', interpreter=None)
+else:
+    test = TestSCons.TestSCons()
+
+test.subdir('cxxtest')
+try:
+    test.dir_fixture('../../../../cxxtest', 'cxxtest')
+except OSError:
+    # test with other cxxtest, if there is no cxxtest in project tree
+    pass
+
+def find_line(content, line):
+    return line in [s.strip() for s in content.splitlines()]
+
+test.file_fixture('../../../../__init__.py', 'site_scons/site_tools/cxxtest/__init__.py')
+test.file_fixture('../../../../about.py', 'site_scons/site_tools/cxxtest/about.py')
+test.file_fixture('../../../../process_.py', 'site_scons/site_tools/cxxtest/process_.py')
+test.file_fixture('../../../../profile_.py', 'site_scons/site_tools/cxxtest/profile_.py')
+test.file_fixture('../../../../report_.py', 'site_scons/site_tools/cxxtest/report_.py')
+test.file_fixture('../../../../runner_.py', 'site_scons/site_tools/cxxtest/runner_.py')
+
+test.write('MyTestSuite1.t.h', r"""\
+// MyTestSuite1.t.h
+#include <cxxtest/TestSuite.h>
+class MyTestSuite1 : public CxxTest::TestSuite
+{
+public:
+void testAddition(void)
+{
+  TS_ASSERT(1 + 1 > 1);
+  TS_ASSERT_EQUALS(1 + 1, 2);
+}
+};
+""")
+
+test.write('MyTestSuite2.t.h', r"""\
+// MyTestSuite2.t.h
+#include <cxxtest/TestSuite.h>
+class MyTestSuite2 : public CxxTest::TestSuite
+{
+public:
+void testAddition(void)
+{
+  TS_ASSERT(2 + 2 > 2);
+  TS_ASSERT_EQUALS(2 + 2, 4);
+}
+};
+""")
+
+test.write('SConstruct', r"""\
+import sconstool.loader
+sconstool.loader.extend_toolpath(transparent=True)
+env = Environment(tools=['default', 'cxxtest'], CXXTESTPROFILE='profile.json')
+if ARGUMENTS.get('SPAWN'):
+    spawn = env['SPAWN']
+    def logSpawn(sh, escape, cmd, args, env):
+        print('spawned: ' + cmd)
+        return spawn(sh, escape, cmd, args, env)
+    env['SPAWN'] = logSpawn
+env.CxxTest('MyTestSuite12', ['MyTestSuite1.t.h', 'MyTestSuite2.t.h'])
+""")
+
+test.run()  # nothing should happen .. but it happens unfortunatelly
+test.must_not_exist('profile.json')
+
+test.run(['-n', 'check'])
+test.must_not_exist('profile.json')
+
+test.run(['check'])
+test.must_contain_all_lines(test.stdout(), [test.workpath('MyTestSuite12')], find_line)
+
+trace = json.loads(test.read('profile.json', mode='r'))
+events = [e for e in trace['traceEvents'] if e['ph'] == 'X']
+names = dict(((e['cat'], e['name']), e) for e in events)
+for key in [('generate', 'MyTestSuite1.t.cpp'),
+            ('generate', 'MyTestSuite2.t.cpp'),
+            ('compile', 'MyTestSuite1.t%s' % _obj),
+            ('compile', 'MyTestSuite2.t%s' % _obj),
+            ('link', 'MyTestSuite12%s' % _exe),
+            ('run', 'MyTestSuite12')]:
+    test.fail_test(key not in names, message='missing event %r' % (key,))
+for e in events:
+    test.fail_test(e['dur'] < 0 or e['args']['status'] != 0)
+    if sys.platform != 'win32':
+        test.fail_test(e['args']['cpu'] < 0 or e['args']['maxrss'] <= 0)
+
+# Custom $SPAWN runs the commands, only their wall time is recorded then
+test.run(['-c'])
+test.run(['check', 'SPAWN=1'])
+test.fail_test(len([s for s in test.stdout().splitlines() if s.startswith('spawned: ')]) < 5)
+trace = json.loads(test.read('profile.json', mode='r'))
+events = [e for e in trace['traceEvents'] if e['ph'] == 'X' and e['cat'] != 'run']
+test.fail_test(len(events) != 5)
+for e in events:
+    test.fail_test(e['dur'] < 0 or e['args']['status'] != 0)
+    test.fail_test('cpu' in e['args'] or 'maxrss' in e['args'])
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
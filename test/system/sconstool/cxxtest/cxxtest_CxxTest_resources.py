@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018-2020 by Paweł Tomulik <ptomulik@meil.pw.edu.pl>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import TestSCons
+import sys
+import os
+
+_exe = TestSCons._exe
+_obj = TestSCons._obj
+
+if sys.platform == 'win32':
+    test = TestSCons.TestSCons(program='scons.bat', interpreter=None)
+else:
+    test = TestSCons.TestSCons()
+
+test.subdir('cxxtest')
+try:
+    test.dir_fixture('../../../../cxxtest', 'cxxtest')
+except OSError:
+    # test with other cxxtest, if there is no cxxtest in project tree
+    pass
+
+def find_line(content, line):
+    return line in [s.strip() for s in content.splitlines()]
+
+test.file_fixture('../../../../__init__.py', 'site_scons/site_tools/cxxtest/__init__.py')
+test.file_fixture('../../../../about.py', 'site_scons/site_tools/cxxtest/about.py')
+test.file_fixture('../../../../process_.py', 'site_scons/site_tools/cxxtest/process_.py')
+test.file_fixture('../../../../profile_.py', 'site_scons/site_tools/cxxtest/profile_.py')
+test.file_fixture('../../../../report_.py', 'site_scons/site_tools/cxxtest/report_.py')
+test.file_fixture('../../../../runner_.py', 'site_scons/site_tools/cxxtest/runner_.py')
+
+# The heavy suite must not run together with the others
+test.write('MyTestSuite1.t.h', r"""\
+// MyTestSuite1.t.h
+#include <cxxtest/TestSuite.h>
+#include <cstdio>
+#include <ctime>
+class MyTestSuite1 : public CxxTest::TestSuite
+{
+public:
+void testHeavy(void)
+{
+  std::FILE* f = std::fopen("heavy.lock", "w");
+  TS_ASSERT(f != 0);
+  std::fclose(f);
+  std::clock_t start = std::clock();
+  while(std::clock() - start < CLOCKS_PER_SEC / 2);
+  TS_ASSERT_EQUALS(std::remove("heavy.lock"), 0);
+}
+};
+""")
+
+for i in (2, 3):
+    test.write('MyTestSuite%d.t.h' % i, r"""\
+// MyTestSuite%(i)d.t.h
+#include <cxxtest/TestSuite.h>
+#include <cstdio>
+class MyTestSuite%(i)d : public CxxTest::TestSuite
+{
+public:
+void testLight(void)
+{
+  std::FILE* f = std::fopen("heavy.lock", "r");
+  if(f) std::fclose(f);
+  TS_ASSERT(f == 0);
+}
+};
+""" % {'i': i})
+
+test.write('SConstruct', r"""\
+import sconstool.loader
+sconstool.loader.extend_toolpath(transparent=True)
+env = Environment(tools=['default', 'cxxtest'],
+                  CXXTESTRUNMEMLIMIT=ARGUMENTS.get('MEMLIMIT', ''))
+if ARGUMENTS.get('MEMLIMIT'):
+    limits = {}
+    if 'HEAVYLIMIT' in ARGUMENTS:
+        limits['CXXTESTRUNMEMLIMIT'] = ARGUMENTS['HEAVYLIMIT']
+    env.CxxTest(['MyTestSuite1.t.h'], CXXTESTRUNMEM=6000, **limits)
+else:
+    env.CxxTest(['MyTestSuite1.t.h'], CXXTESTRUNWEIGHT=3)
+env.CxxTest(['MyTestSuite2.t.h', 'MyTestSuite3.t.h'], CXXTESTRUNMEM=1000)
+""")
+
+programs = [test.workpath('MyTestSuite%d' % i) for i in (1, 2, 3)]
+
+# Heavy program takes all the job slots
+test.run(['-j', '3', 'check'])
+test.must_contain_all_lines(test.stdout(), programs, find_line)
+test.must_not_exist('heavy.lock')
+
+# Heavy program takes most of the memory
+test.run(['-j', '3', 'check', 'MEMLIMIT=6500'])
+test.must_contain_all_lines(test.stdout(), programs, find_line)
+test.must_not_exist('heavy.lock')
+
+# The smallest limit applies, whichever action sets it
+for heavylimit in ('0', '100000'):
+    test.run(['-j', '3', 'check', 'MEMLIMIT=6500', 'HEAVYLIMIT=' + heavylimit])
+    test.must_contain_all_lines(test.stdout(), programs, find_line)
+    test.must_not_exist('heavy.lock')
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018-2020 by Paweł Tomulik <ptomulik@meil.pw.edu.pl>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import TestSCons
+import sys
+import os
+import json
+
+_exe = TestSCons._exe
+_obj = TestSCons._obj
+
+if sys.platform == 'win32':
+    test = TestSCons.TestSCons(program='scons.bat', interpreter=None)
+else:
+    test = TestSCons.TestSCons()
+
+test.subdir('cxxtest')
+try:
+    test.dir_fixture('../../../../cxxtest', 'cxxtest')
+except OSError:
+    # test with other cxxtest, if there is no cxxtest in project tree
+    pass
+
+def find_line(content, line):
+    return line in [s.strip() for s in content.splitlines()]
+
+test.file_fixture('../../../../__init__.py', 'site_scons/site_tools/cxxtest/__init__.py')
+test.file_fixture('../../../../about.py', 'site_scons/site_tools/cxxtest/about.py')
+test.file_fixture('../../../../process_.py', 'site_scons/site_tools/cxxtest/process_.py')
+test.file_fixture('../../../../profile_.py', 'site_scons/site_tools/cxxtest/profile_.py')
+test.file_fixture('../../../../report_.py', 'site_scons/site_tools/cxxtest/report_.py')
+test.file_fixture('../../../../runner_.py', 'site_scons/site_tools/cxxtest/runner_.py')
+
+test.write('MyTestSuite1.t.h', r"""\
+// MyTestSuite1.t.h
+#include <cxxtest/TestSuite.h>
+class MyTestSuite1 : public CxxTest::TestSuite
+{
+public:
+void testAddition(void)
+{
+  TS_ASSERT(1 + 1 > 1);
+  TS_ASSERT_EQUALS(1 + 1, 2);
+}
+};
+""")
+
+test.write('MyTestSuite2.t.h', r"""\
+// MyTestSuite2.t.h
+#include <cxxtest/TestSuite.h>
+class MyTestSuite2 : public CxxTest::TestSuite
+{
+public:
+void testAddition(void)
+{
+  TS_ASSERT(2 + 2 > 2);
+  TS_ASSERT_EQUALS(2 + 2, 4);
+}
+};
+""")
+
+test.write('MyTestSuite3.t.h', r"""\
+// MyTestSuite3.t.h
+#include <cxxtest/TestSuite.h>
+class MyTestSuite3 : public CxxTest::TestSuite
+{
+public:
+void testAddition(void)
+{
+  TS_ASSERT(3 + 3 > 3);
+  TS_ASSERT_EQUALS(3 + 3, 6);
+}
+};
+""")
+
+test.write('SConstruct', r"""\
+import sconstool.loader
+sconstool.loader.extend_toolpath(transparent=True)
+env = Environment(tools=['default', 'cxxtest'], CXXTESTREPORT='#reports/cxxtest',
+                  CXXTESTSPLITSUITES=ARGUMENTS.get('SPLIT', False))
+env.CxxTest('MyTests', ['MyTestSuite1.t.h', 'MyTestSuite2.t.h', 'MyTestSuite3.t.h'])
+prog = env.CxxTestProgram('Wrapped', ['MyTestSuite1.t.h', 'MyTestSuite2.t.h'],
+                          CXXTESTSPLITSUITES=1,
+                          CXXTESTRUNCOM=r'%(_python_)s wrap.py $SOURCE.abspath $CXXTESTRUNFLAGS')
+env.Alias('wrapped', env.CxxTestRun(prog))
+""" % {'_python_': TestSCons._python_})
+
+test.write('wrap.py', r"""\
+import subprocess
+import sys
+sys.exit(subprocess.call(sys.argv[1:]))
+""")
+
+def names():
+    report = json.loads(test.read(['reports', 'cxxtest.json'], mode='r'))
+    return sorted(t['name'] for t in report['tests'])
+
+def count_runs(content):
+    return len([s for s in content.splitlines() if s.startswith('Running cxxtest tests')])
+
+# All suites run by one process
+test.run(['-j', '3', 'check'])
+test.fail_test(count_runs(test.stdout()) != 1)
+test.fail_test(names() != ['MyTests'])
+
+# Each suite run by its own process
+test.run(['-j', '3', 'check', 'SPLIT=1'])
+test.fail_test(count_runs(test.stdout()) != 3)
+test.fail_test(names() != ['MyTests:MyTestSuite1', 'MyTests:MyTestSuite2', 'MyTests:MyTestSuite3'])
+
+# Suites are listed and run with the command of the program's environment
+test.run(['wrapped'])
+test.fail_test(count_runs(test.stdout()) != 2)
+test.fail_test(names() != ['Wrapped:MyTestSuite1', 'Wrapped:MyTestSuite2'])
+report = json.loads(test.read(['reports', 'cxxtest.json'], mode='r'))
+test.fail_test(not all('wrap.py' in t['command'] for t in report['tests']))
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
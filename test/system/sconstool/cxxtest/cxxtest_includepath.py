@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018-2020 by Paweł Tomulik <ptomulik@meil.pw.edu.pl>
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import TestSCons
+import json
+import sys
+import os
+
+if sys.platform == 'win32':
+    test = TestSCons.TestSCons(program='scons.bat', interpreter=None)
+else:
+    test = TestSCons.TestSCons()
+
+test.file_fixture('../../../../__init__.py', 'site_scons/site_tools/cxxtest/__init__.py')
+test.file_fixture('../../../../about.py', 'site_scons/site_tools/cxxtest/about.py')
+test.file_fixture('../../../../process_.py', 'site_scons/site_tools/cxxtest/process_.py')
+test.file_fixture('../../../../profile_.py', 'site_scons/site_tools/cxxtest/profile_.py')
+test.file_fixture('../../../../report_.py', 'site_scons/site_tools/cxxtest/report_.py')
+test.file_fixture('../../../../runner_.py', 'site_scons/site_tools/cxxtest/runner_.py')
+
+test.subdir('tools', ['tools', 'bin'], 'include', ['include', 'cxxtest'])
+test.write(['tools', 'bin', 'cxxtestgen'], "")
+test.write(['include', 'cxxtest', 'TestSuite.h'], "")
+
+test.write('SConstruct', r"""\
+import sconstool.loader
+sconstool.loader.extend_toolpath(transparent=True)
+env = Environment(tools=['default', 'cxxtest'],
+                  CXXTESTGEN='tools/bin/cxxtestgen',
+                  CXXTESTINCLUDESEARCH=ARGUMENTS.get('SEARCH', '..').split(','),
+                  CXXTESTINCLUDECACHE='cache.json')
+print('INCLUDEPATH: %r' % env['CXXTESTINCLUDEPATH'])
+""")
+
+test.run(['-Q', '.'])
+test.must_contain_all_lines(test.stdout(), ['INCLUDEPATH: []'])
+
+test.run(['-Q', 'SEARCH=..,../../include', '.'])
+test.must_contain_all_lines(test.stdout(), ['INCLUDEPATH: %r' % [test.workpath('include')]])
+
+cache = json.loads(test.read('cache.json', mode='r'))
+test.fail_test(len(cache) != 2)
+test.fail_test([test.workpath('include')] not in [e['path'] for e in cache.values()])
+
+# Cached result is used as long as the script is not modified
+os.remove(test.workpath('include', 'cxxtest', 'TestSuite.h'))
+test.run(['-Q', 'SEARCH=..,../../include', '.'])
+test.must_contain_all_lines(test.stdout(), ['INCLUDEPATH: %r' % [test.workpath('include')]])
+
+test.sleep()
+test.write(['tools', 'bin', 'cxxtestgen'], "# modified\n")
+test.run(['-Q', 'SEARCH=..,../../include', '.'])
+test.must_contain_all_lines(test.stdout(), ['INCLUDEPATH: []'])
+
+test.pass_test()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4: